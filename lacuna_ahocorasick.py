@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+МНОЖЕСТВЕННЫЙ ПОИСК ИМЁН (Ахо–Корасик)
+Автомат строится один раз по всем именам файлов и за один линейный проход
+по документу находит все упомянутые имена — вместо отдельной регулярки
+на каждую пару файлов.
+"""
+
+from collections import deque
+
+def _is_word(c):
+    """То же, что \\w в re для str: буква/цифра Юникода или '_'."""
+    return c.isalnum() or c == "_"
+
+def _fold(text):
+    """Регистронезависимая форма без изменения длины (позиции совпадают с исходником)."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    # Редкие символы вроде 'İ' при lower() удлиняются — понижаем посимвольно
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class AhoCorasick:
+    """
+    Автомат Ахо–Корасик по набору строк (без учёта регистра).
+    Совпадения можно фильтровать по границам слова с семантикой
+    re.search(r'\\b' + re.escape(pattern) + r'\\b', text, re.IGNORECASE).
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._lengths = []
+
+        for idx, pattern in enumerate(self.patterns):
+            key = _fold(pattern)
+            self._lengths.append(len(key))
+            if not key:
+                continue
+            state = 0
+            for c in key:
+                nxt = self._goto[state].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][c] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(idx)
+
+        # Ссылки неудач — обходом в ширину; выходы наследуются от fail-состояния
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(c, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text):
+        """Отдаёт все (начало, конец, индекс шаблона), включая перекрывающиеся."""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        state = 0
+        for i, c in enumerate(_fold(text)):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for idx in out[state]:
+                yield i + 1 - lengths[idx], i + 1, idx
+
+    def find_words(self, text, before="", after=""):
+        """
+        Множество индексов шаблонов, встречающихся в text как целые слова (\\b...\\b).
+        before/after — символы сразу до и после text, если text — окно внутри
+        большего документа (иначе края окна считались бы границами слова).
+        """
+        found = set()
+        n = len(text)
+        left = bool(before) and _is_word(before[-1])
+        right = bool(after) and _is_word(after[0])
+        for start, end, idx in self.iter_matches(text):
+            if idx in found:
+                continue
+            # \b перед и после: «словность» соседних символов должна различаться
+            word_before = _is_word(text[start - 1]) if start > 0 else left
+            if word_before == _is_word(text[start]):
+                continue
+            word_after = _is_word(text[end]) if end < n else right
+            if word_after == _is_word(text[end - 1]):
+                continue
+            found.add(idx)
+        return found
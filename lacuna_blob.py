@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+ХРАНИЛИЩЕ СОДЕРЖИМОГО (blob + таблица смещений)
+Тексты всех файлов дописываются подряд в один бинарный файл (UTF-8), рядом
+лежит таблица смещений — N+1 границ документов (int64, little-endian).
+Индекс хранит только ссылки {"offset", "length"}; читатель отображает blob
+в память (mmap) и вырезает нужный документ без разбора чего-либо ещё.
+"""
+
+import sys
+import mmap
+from array import array
+from pathlib import Path
+
+OFFSETS_SUFFIX = ".offsets"
+
+def offsets_path(blob_path):
+    """Путь таблицы смещений для данного blob-файла."""
+    blob_path = Path(blob_path)
+    return blob_path.with_name(blob_path.name + OFFSETS_SUFFIX)
+
+def _map(f):
+    """mmap только для чтения; пустой файл отображать нельзя — для него пустые байты."""
+    f.seek(0, 2)
+    if f.tell() == 0:
+        return b""
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _dump_offsets(offsets, path):
+    data = array('q', offsets)
+    if sys.byteorder != "little":
+        data.byteswap()
+    with open(path, 'wb') as f:
+        data.tofile(f)
+
+def _load_offsets(path):
+    data = array('q')
+    with open(path, 'rb') as f:
+        data.frombytes(f.read())
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+class ContentStore:
+    """
+    Хранилище текстов корпуса поверх blob-файла (тот же интерфейс, что у
+    lacuna_corpus.TextStore). Запись — только дописыванием; чтение идёт через
+    mmap, который переоткрывается лениво, если с прошлого чтения blob вырос.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offsets = array('q', [0])
+        self._f = open(self.path, 'w+b')
+        self._map = b""
+        self._mapped = 0
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, text):
+        data = text.encode("utf-8", errors="surrogatepass")
+        self._f.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        return len(self.offsets) - 2
+
+    def ref(self, idx):
+        """Ссылка на документ для записи в индекс."""
+        start = self.offsets[idx]
+        return {"offset": start, "length": self.offsets[idx + 1] - start}
+
+    def raw(self, idx):
+        """Байты документа — срез отображённой памяти, без копирования."""
+        return memoryview(self._mapping())[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def get(self, idx):
+        return self._mapping()[self.offsets[idx]:self.offsets[idx + 1]].decode("utf-8", "surrogatepass")
+
+    def _mapping(self):
+        """Текущее отображение blob; переоткрывается, если с прошлого раза дописаны данные."""
+        if self._mapped < self.offsets[-1]:
+            self._f.flush()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+            self._map = _map(self._f)
+            self._mapped = self.offsets[-1]
+        return self._map
+
+    def flush(self):
+        """Сбрасывает blob на диск и пишет таблицу смещений (хранилище остаётся открытым)."""
+        self._f.flush()
+        _dump_offsets(self.offsets, offsets_path(self.path))
+
+    def close(self):
+        if self._f.closed:
+            return
+        self.flush()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = b""
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class ContentBlob:
+    """
+    Читатель готового blob-файла: blob отображается в память, таблица смещений
+    читается целиком (8 байт на документ).
+
+        with ContentBlob(OUTPUT_DIR / "00_ENHANCED_CONTENT.blob") as blob:
+            text = blob.text(file_id)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.offsets = _load_offsets(offsets_path(self.path))
+        self._f = open(self.path, 'rb')
+        self._map = _map(self._f)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, idx):
+        return memoryview(self._map)[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def text(self, idx):
+        return self._map[self.offsets[idx]:self.offsets[idx + 1]].decode("utf-8", "surrogatepass")
+
+    get = text  # интерфейс хранилища текстов для lacuna_corpus.Corpus
+
+    def ref(self, idx):
+        start = self.offsets[idx]
+        return {"offset": start, "length": self.offsets[idx + 1] - start}
+
+    def slice(self, offset, length):
+        """Документ по ссылке из индекса ({"offset", "length"})."""
+        return self._map[offset:offset + length].decode("utf-8", "surrogatepass")
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = b""
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
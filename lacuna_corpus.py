@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+КОМПАКТНАЯ МОДЕЛЬ КОРПУСА
+Метаданные файлов лежат в параллельных массивах (размер, mtime, число слов,
+строк, код расширения), тексты — в одном общем хранилище, id файла — это
+просто его позиция. Поиск по id — O(1), предпросмотр вычисляется из текста
+и отдельно не хранится.
+"""
+
+from array import array
+from collections import defaultdict
+from datetime import datetime
+
+PREVIEW_CHARS = 200
+
+class TextStore:
+    """Общее хранилище текстов: каждый документ хранится ровно один раз."""
+
+    def __init__(self):
+        self._texts = []
+
+    def append(self, text):
+        self._texts.append(text)
+        return len(self._texts) - 1
+
+    def get(self, idx):
+        return self._texts[idx]
+
+    def __len__(self):
+        return len(self._texts)
+
+class FileRecord:
+    """Лёгкое представление одного файла поверх массивов корпуса (без копирования данных)."""
+
+    __slots__ = ("corpus", "id")
+
+    def __init__(self, corpus, file_id):
+        self.corpus = corpus
+        self.id = file_id
+
+    @property
+    def name(self):
+        return self.corpus.names[self.id]
+
+    @property
+    def path(self):
+        return self.corpus.paths[self.id]
+
+    @property
+    def size(self):
+        return self.corpus.sizes[self.id]
+
+    @property
+    def modified(self):
+        return self.corpus.modified(self.id)
+
+    @property
+    def extension(self):
+        return self.corpus.extension(self.id)
+
+    @property
+    def encoding(self):
+        return self.corpus.encoding(self.id)
+
+    @property
+    def word_count(self):
+        return self.corpus.word_counts[self.id]
+
+    @property
+    def lines(self):
+        return self.corpus.line_counts[self.id]
+
+    @property
+    def content(self):
+        return self.corpus.text(self.id)
+
+    @property
+    def content_preview(self):
+        return self.corpus.preview(self.id)
+
+class Corpus:
+    """
+    Колоночный корпус лакун. Стадии мега-анализатора работают с ним напрямую;
+    словари в старом формате enhanced_index.json собираются только при записи.
+    """
+
+    def __init__(self, meta=None, texts=None):
+        self.meta = meta or {}
+        self.names = []
+        self.paths = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.word_counts = array('l')
+        self.line_counts = array('l')
+        self.ext_codes = array('H')
+        self.extensions = []          # код -> расширение
+        self._ext_index = {}          # расширение -> код
+        self.enc_codes = array('B')
+        self.encodings = []           # код -> кодировка исходного файла (lacuna_decode)
+        self._enc_index = {}          # кодировка -> код
+        self._by_name = defaultdict(list)
+        self.texts = texts if texts is not None else TextStore()
+        self.stats = defaultdict(int)
+        self.digests = {}             # id -> дайджест (только для файлов с совпавшим размером)
+        self.duplicates = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, path, size, mtime, extension, content, encoding="utf-8",
+            word_count=None, lines=None):
+        """
+        Добавляет файл и возвращает его id. word_count/lines передаются, если
+        content — только начало файла, а счётчики посчитаны по всему тексту.
+        """
+        self.texts.append(content)
+        if word_count is None:
+            word_count = len(content.split())
+        if lines is None:
+            lines = content.count('\n') + 1
+        return self._add_meta(name, path, size, mtime, extension, word_count, lines, encoding)
+
+    def _add_meta(self, name, path, size, mtime, extension, word_count, lines, encoding="utf-8"):
+        file_id = len(self.names)
+        code = self._ext_index.get(extension)
+        if code is None:
+            code = self._ext_index[extension] = len(self.extensions)
+            self.extensions.append(extension)
+        enc_code = self._enc_index.get(encoding)
+        if enc_code is None:
+            enc_code = self._enc_index[encoding] = len(self.encodings)
+            self.encodings.append(encoding)
+
+        self.names.append(name)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.ext_codes.append(code)
+        self.enc_codes.append(enc_code)
+        self.word_counts.append(word_count)
+        self.line_counts.append(lines)
+        self._by_name[name].append(file_id)
+
+        self.stats["total_files"] += 1
+        self.stats["total_size"] += size
+        self.stats[extension] += 1
+        return file_id
+
+    @classmethod
+    def from_records(cls, records, texts, meta=None, duplicates=None):
+        """
+        Восстанавливает корпус из записей enhanced_index (записи идут по порядку id);
+        тексты берутся из уже записанного хранилища, например lacuna_blob.ContentBlob.
+        """
+        corpus = cls(meta, texts)
+        for record in records:
+            file_id = corpus._add_meta(
+                record["name"], record["path"], record["size"],
+                datetime.fromisoformat(record["modified"]).timestamp(),
+                record["extension"], record["word_count"], record["lines"],
+                record.get("encoding", "utf-8"))
+            if "digest" in record:
+                corpus.digests[file_id] = record["digest"]
+        corpus.duplicates = duplicates or []
+        return corpus
+
+    # ---------- доступ по id ----------
+    def __getitem__(self, file_id):
+        return FileRecord(self, file_id)
+
+    def __iter__(self):
+        return (FileRecord(self, i) for i in range(len(self.names)))
+
+    def text(self, file_id):
+        return self.texts.get(file_id)
+
+    def preview(self, file_id):
+        content = self.texts.get(file_id)
+        return content[:PREVIEW_CHARS] + "..." if len(content) > PREVIEW_CHARS else content
+
+    def extension(self, file_id):
+        return self.extensions[self.ext_codes[file_id]]
+
+    def encoding(self, file_id):
+        return self.encodings[self.enc_codes[file_id]]
+
+    def modified(self, file_id):
+        return datetime.fromtimestamp(self.mtimes[file_id]).isoformat()
+
+    def ids_by_name(self, name):
+        """Все id файлов с данным именем (имена в разных папках могут совпадать)."""
+        return self._by_name.get(name, [])
+
+    def extension_counts(self):
+        """Число файлов по расширению — без прохода по записям."""
+        counts = defaultdict(int)
+        for code in self.ext_codes:
+            counts[code] += 1
+        return {self.extensions[code]: count for code, count in counts.items()}
+
+    def newest_first(self):
+        """id файлов, отсортированные по дате изменения (новые сверху)."""
+        return sorted(range(len(self.names)), key=self.mtimes.__getitem__, reverse=True)
+
+    # ---------- совместимость с enhanced_index.json ----------
+    def record_dict(self, file_id):
+        """
+        Запись файла в словарном формате enhanced_index.json. Если тексты лежат
+        в blob-хранилище (lacuna_blob.ContentStore), вместо content_full и
+        content_preview пишется только ссылка "content": {"offset", "length"}.
+        """
+        data = {
+            "id": file_id,
+            "name": self.names[file_id],
+            "path": self.paths[file_id],
+            "size": self.sizes[file_id],
+            "modified": self.modified(file_id),
+            "extension": self.extension(file_id),
+            "encoding": self.encoding(file_id),
+        }
+        ref = getattr(self.texts, "ref", None)
+        if ref is not None:
+            data["content"] = ref(file_id)
+        else:
+            data["content_preview"] = self.preview(file_id)
+            data["content_full"] = self.text(file_id)
+        data["word_count"] = self.word_counts[file_id]
+        data["lines"] = self.line_counts[file_id]
+        if file_id in self.digests:
+            data["digest"] = self.digests[file_id]
+        return data
+
+    def iter_record_dicts(self):
+        return (self.record_dict(i) for i in range(len(self.names)))
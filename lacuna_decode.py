@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+ДЕКОДИРОВАНИЕ ФАЙЛОВ ЗА ОДНО ЧТЕНИЕ
+Файл читается в байты один раз, кодировка определяется по этому же буферу:
+BOM → корректный UTF-8 → однобайтовая кириллица (cp1251 / koi8-r / cp866,
+выбирается по частотам русских букв). Найденная кодировка пишется в индекс;
+при следующем прогоне она передаётся как подсказка (hint), и эвристика
+однобайтовых кодировок уже не запускается. Большие файлы можно читать
+кусками (TextStream): кодировка определяется по первому куску.
+"""
+
+import codecs
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+SINGLE_BYTE = ("cp1251", "koi8-r", "cp866")  # Порядок важен: при равенстве побеждает первая
+CHUNK_BYTES = 1 << 16   # Байт на одно чтение в потоковом режиме (TextStream)
+MAX_CHAR_BYTES = 4      # Байт на символ в худшем случае (для чтения с ограничением limit)
+UPPER_WEIGHT = 0.2      # Заглавные буквы в тексте редки — их вклад в оценку меньше
+
+# Частоты букв русского языка (на тысячу)
+LETTER_FREQ = {
+    'о': 109.7, 'е': 84.5, 'а': 80.1, 'и': 73.5, 'н': 67.0, 'т': 62.6, 'с': 54.7,
+    'р': 47.3, 'в': 45.4, 'л': 44.0, 'к': 34.9, 'м': 32.1, 'д': 29.8, 'п': 28.1,
+    'у': 26.2, 'я': 20.1, 'ы': 19.0, 'ь': 17.4, 'г': 17.0, 'з': 16.5, 'б': 15.9,
+    'ч': 14.4, 'й': 12.1, 'х': 9.7, 'ж': 9.4, 'ш': 7.3, 'ю': 6.4, 'ц': 4.8,
+    'щ': 3.6, 'э': 3.2, 'ф': 2.6, 'ъ': 0.4, 'ё': 0.4,
+}
+
+_weights = {}  # кодировка -> вес каждого байта 0x80..0xFF
+
+def _byte_weights(encoding):
+    """Вес старших байтов в данной кодировке: частота буквы, в которую байт декодируется."""
+    if encoding not in _weights:
+        table = []
+        for byte in range(0x80, 0x100):
+            char = bytes([byte]).decode(encoding, errors="replace")
+            weight = LETTER_FREQ.get(char, 0.0)
+            if not weight and char.lower() != char:
+                weight = LETTER_FREQ.get(char.lower(), 0.0) * UPPER_WEIGHT
+            table.append(weight)
+        _weights[encoding] = table
+    return _weights[encoding]
+
+def guess_single_byte(data):
+    """Однобайтовая кодировка кириллицы, в которой старшие байты больше всего похожи на русский текст."""
+    counts = [0] * 0x80
+    for byte in data:
+        if byte >= 0x80:
+            counts[byte - 0x80] += 1
+    best, best_score = SINGLE_BYTE[0], 0.0
+    for encoding in SINGLE_BYTE:
+        score = sum(count * weight for count, weight in zip(counts, _byte_weights(encoding)) if count)
+        if score > best_score:
+            best, best_score = encoding, score
+    return best
+
+def _normalize_newlines(text):
+    """Как у open() в текстовом режиме: \\r\\n и \\r превращаются в \\n."""
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+def _start(data, hint, final):
+    """
+    Определяет кодировку по первому буферу и декодирует его.
+    Возвращает (декодер для следующих байтов, текст, кодировка).
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            return decoder, decoder.decode(data, final), encoding
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        text = decoder.decode(data, final)
+        decoder.errors = "replace"  # Дальше файла битые байты уже не меняют решения
+        return decoder, text, "utf-8"
+    except UnicodeDecodeError:
+        pass
+    encoding = hint if hint in SINGLE_BYTE else guess_single_byte(data)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    return decoder, decoder.decode(data, final), encoding
+
+def decode(data, hint=None, final=True):
+    """
+    Декодирует байты, определяя кодировку. hint — кодировка из прошлого индекса:
+    однобайтовая подсказка избавляет от частотной эвристики (но корректный UTF-8
+    и BOM всё равно важнее — файл могли пересохранить). final=False — буфер
+    обрезан, незаконченный многобайтовый символ в конце отбрасывается.
+    Возвращает (текст, кодировка).
+    """
+    _, text, encoding = _start(data, hint, final)
+    return text, encoding
+
+def read_text(path, limit=None, hint=None):
+    """
+    Читает файл одним read() и декодирует (переводы строк — как у open()).
+    limit — не больше стольких символов: читается limit * MAX_CHAR_BYTES байт.
+    Возвращает (текст, кодировка); OSError пробрасывается.
+    """
+    with open(path, 'rb') as f:
+        if limit is None:
+            data, final = f.read(), True
+        else:
+            size = limit * MAX_CHAR_BYTES
+            data = f.read(size)
+            final = len(data) < size
+    text, encoding = decode(data, hint, final)
+    text = _normalize_newlines(text)
+    return (text if limit is None else text[:limit]), encoding
+
+class TextStream:
+    """
+    Текст файла кусками по chunk_bytes байт (переводы строк — как у open()):
+        stream = TextStream(path, hint)
+        for text in stream: ...
+    Кодировка определяется по первому куску и доступна как stream.encoding.
+    """
+
+    def __init__(self, path, hint=None, chunk_bytes=CHUNK_BYTES):
+        self.path = path
+        self.hint = hint
+        self.chunk_bytes = chunk_bytes
+        self.encoding = None
+
+    def __iter__(self):
+        decoder = None
+        pending_cr = ""  # \r в конце куска: может оказаться половиной \r\n
+        with open(self.path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_bytes)
+                final = len(data) < self.chunk_bytes
+                if decoder is None:
+                    decoder, text, self.encoding = _start(data, self.hint, final)
+                else:
+                    text = decoder.decode(data, final)
+                text = pending_cr + text
+                pending_cr = ""
+                if not final and text.endswith("\r"):
+                    text, pending_cr = text[:-1], "\r"
+                if text:
+                    yield _normalize_newlines(text)
+                if final:
+                    return
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+ДУБЛИКАТЫ ЛАКУН
+Дайджест содержимого считается только для файлов, чей размер совпал
+хотя бы с одним другим файлом, — поэтому поиск копий почти бесплатен.
+"""
+
+import hashlib
+from collections import defaultdict
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 20
+
+def file_digest(path):
+    """Быстрый дайджест содержимого (BLAKE2b, 128 бит) в hex."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def find_duplicates(records, root, size_key="size_bytes"):
+    """
+    Группирует записи с одинаковым содержимым.
+    Дайджест вычисляется лишь при совпадении размеров и сохраняется в записи
+    (поле "digest"), так что повторные вызовы не перечитывают файлы.
+    Пустые файлы не считаются дубликатами.
+    Возвращает список групп {"digest", "size_bytes", "paths"}, крупные сверху.
+    """
+    root = Path(root)
+    by_size = defaultdict(list)
+    for record in records:
+        if record[size_key] > 0:
+            by_size[record[size_key]].append(record)
+
+    groups = defaultdict(list)
+    for size, same_size in by_size.items():
+        if len(same_size) < 2:
+            continue
+        for record in same_size:
+            if "digest" not in record:
+                try:
+                    record["digest"] = file_digest(root / record["path"])
+                except OSError:
+                    continue
+            groups[(size, record["digest"])].append(record["path"])
+
+    duplicates = [
+        {"digest": digest, "size_bytes": size, "paths": sorted(paths)}
+        for (size, digest), paths in groups.items() if len(paths) > 1
+    ]
+    duplicates.sort(key=lambda g: (-g["size_bytes"], g["paths"][0]))
+    return duplicates
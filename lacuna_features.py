@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+ОБЩАЯ ВЕКТОРИЗАЦИЯ ЛАКУН
+Каждый документ токенизируется один раз; частоты терминов кэшируются на диске
+по хэшу содержимого. Представления для ключевых слов и для семантической
+близости (TF-IDF с разными max_features/stop_words) строятся из этого кэша,
+поэтому повторный прогон токенизирует только изменившиеся файлы.
+"""
+
+import re
+import json
+import zlib
+import hashlib
+import heapq
+from array import array
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+# Совпадает с токенизацией TfidfVectorizer по умолчанию (lowercase + token_pattern)
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+TOKENIZER_VERSION = 1  # Меняется при изменении токенизации — старый кэш становится недействительным
+HASH_FEATURES = 2 ** 18  # Размер хэшированного пространства признаков
+
+def tokenize(text):
+    """Частоты терминов документа."""
+    return Counter(TOKEN_RE.findall(text.lower()))
+
+def content_key(text):
+    """Ключ кэша: хэш содержимого и версии токенизатора."""
+    h = hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16)
+    h.update(b"tok%d" % TOKENIZER_VERSION)
+    return h.hexdigest()
+
+class FeatureCache:
+    """
+    Кэш частот терминов на диске: {ключ содержимого: {термин: частота}}.
+    При сохранении остаются только записи, использованные в этом прогоне.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._entries = {}
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("tokenizer_version") == TOKENIZER_VERSION:
+                self._entries = data.get("documents", {})
+        except (OSError, ValueError):
+            pass
+
+    def counts(self, text):
+        """Частоты терминов для текста — из кэша или после токенизации."""
+        key = content_key(text)
+        self._used.add(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = dict(tokenize(text))
+            self._entries[key] = entry
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def counts_for(self, texts):
+        return [self.counts(text) for text in texts]
+
+    def save(self):
+        documents = {key: self._entries[key] for key in self._used if key in self._entries}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({"tokenizer_version": TOKENIZER_VERSION, "documents": documents},
+                      f, ensure_ascii=False)
+
+def count_matrix(counts_list, vocabulary, order=None):
+    """
+    Разреженная матрица частот (документы × термины словаря).
+    order — ранг термина для порядка хранения внутри строки (по умолчанию
+    порядок словаря); от него зависит, как разрешаются равные веса при сортировке.
+    """
+    indptr = [0]
+    indices = []
+    data = []
+    for counts in counts_list:
+        row = [(vocabulary[term], count) for term, count in counts.items() if term in vocabulary]
+        if order is not None:
+            row.sort(key=lambda item: order[item[0]])
+        for col, count in row:
+            indices.append(col)
+            data.append(count)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix((np.asarray(data, dtype=np.float64), indices, indptr),
+                               shape=(len(counts_list), len(vocabulary)))
+    return matrix
+
+def tfidf(counts_list, max_features=None, stop_words=None, return_idf=False):
+    """
+    TF-IDF из кэшированных частот с теми же правилами, что у TfidfVectorizer
+    по умолчанию: max_features — самые частые по корпусу термины,
+    idf = ln((1 + n) / (1 + df)) + 1, L2-нормировка строк.
+    Возвращает (матрица, массив имён признаков в алфавитном порядке)
+    и, при return_idf=True, третьим элементом веса IDF признаков.
+    """
+    stop = set(stop_words or ())
+    totals = Counter()  # порядок ключей — первое появление термина в корпусе
+    for counts in counts_list:
+        for term, count in counts.items():
+            if term not in stop:
+                totals[term] += count
+    if not totals:
+        raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+
+    terms = sorted(totals)
+    if max_features is not None and len(terms) > max_features:
+        # Тот же отбор, что в sklearn (argsort по убыванию частоты поверх алфавитного
+        # порядка), чтобы и при равных частотах выбирались те же термины
+        tfs = np.asarray([totals[term] for term in terms], dtype=np.int64)
+        keep = np.sort((-tfs).argsort()[:max_features])
+        terms = [terms[i] for i in keep]
+    vocabulary = {term: i for i, term in enumerate(terms)}
+
+    # Внутри строки термины хранятся в порядке первого появления в корпусе — как у
+    # sklearn, чтобы равные по весу ключевые слова выбирались в том же порядке
+    first_seen = {term: rank for rank, term in enumerate(totals)}
+    order = [first_seen[term] for term in terms]
+    tf = count_matrix(counts_list, vocabulary, order)
+    n_docs = tf.shape[0]
+    df = np.bincount(tf.indices, minlength=len(terms))
+    idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+    matrix = tf @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = (sparse.diags(1.0 / norms) @ matrix).tocsr()
+    if return_idf:
+        return matrix, np.asarray(terms, dtype=object), idf
+    return matrix, np.asarray(terms, dtype=object)
+
+def top_k_rows(matrix, k, min_score=None):
+    """
+    До k наибольших весов в каждой строке разреженной матрицы — одной сортировкой
+    по всем ненулевым элементам, без цикла по строкам. Равные веса идут в порядке
+    хранения внутри строки (как у sorted(..., reverse=True) по nonzero()).
+    min_score — отбросить из отобранных веса не выше порога.
+    Возвращает (строки, столбцы, веса): по возрастанию строки, внутри — по убыванию веса.
+    """
+    matrix = sparse.csr_matrix(matrix)
+    indptr = np.asarray(matrix.indptr, dtype=np.int64)
+    rows = np.repeat(np.arange(matrix.shape[0], dtype=np.int64), np.diff(indptr))
+    order = np.lexsort((-matrix.data, rows))  # lexsort устойчив
+    rows = rows[order]
+    keep = np.arange(len(order)) - indptr[rows] < k
+    if min_score is not None:
+        keep &= matrix.data[order] > min_score
+    order = order[keep]
+    return rows[keep], matrix.indices[order], matrix.data[order]
+
+# ========== ПОТОКОВЫЙ РЕЖИМ (хэшированные признаки) ==========
+def hash_term(term, n_features=HASH_FEATURES):
+    """Столбец термина: crc32 стабилен между процессами и запусками (в отличие от hash())."""
+    return zlib.crc32(term.encode("utf-8", errors="surrogatepass")) % n_features
+
+def _batches(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+def _map_counts(texts, batch_size, workers):
+    """Частоты терминов по документам, пачками; при workers > 1 токенизация идёт в процессах."""
+    if workers > 1:
+        with Pool(workers) as pool:
+            for batch in _batches(texts, batch_size):
+                yield pool.map(tokenize, batch, chunksize=max(1, len(batch) // (workers * 4)))
+    else:
+        for batch in _batches(texts, batch_size):
+            yield [tokenize(text) for text in batch]
+
+def _append_raw(f, values, typecode):
+    array(typecode, values).tofile(f)
+
+def _load_raw(path, dtype):
+    if Path(path).stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+def _top_columns(totals, max_features, excluded=()):
+    """Маска max_features самых частых по корпусу столбцов (как max_features у TfidfVectorizer)."""
+    totals = totals.copy()
+    totals[list(excluded)] = 0
+    mask = np.zeros(len(totals), dtype=bool)
+    if max_features is None:
+        mask[totals > 0] = True
+    else:
+        top = np.argsort(-totals, kind="stable")[:max_features]
+        mask[top[totals[top] > 0]] = True
+    return mask
+
+def _weigh(merged, mask, idf):
+    """Столбцы и L2-нормированные веса TF-IDF документа внутри маски признаков."""
+    cols = np.fromiter((c for c in sorted(merged) if mask[c]), dtype=np.int64)
+    values = np.fromiter((merged[c] for c in cols.tolist()), dtype=np.float64, count=len(cols)) * idf[cols]
+    norm = np.sqrt(values @ values)
+    if norm > 0:
+        values /= norm
+    return cols, values
+
+def hashed_tfidf(texts, n_features=HASH_FEATURES, batch_size=1000, workers=1, directory=None,
+                 max_features=None, keywords=0, keyword_features=None, stop_words=None,
+                 counts=False, return_idf=False):
+    """
+    TF-IDF в хэшированном пространстве фиксированного размера за два потоковых прохода:
+    первый считает документную и общую частоту столбцов, второй — нормированные строки.
+    texts — функция без аргументов, возвращающая новый итератор текстов (читаются дважды).
+    В памяти одновременно только batch_size документов; строки результата пишутся
+    в directory (data/indices/indptr) и отображаются обратно через np.memmap.
+    max_features — оставить только самые частые по корпусу столбцы.
+    keywords > 0 — для каждого документа вернуть до стольких терминов с наибольшим
+    весом в отдельном пространстве из keyword_features столбцов без stop_words.
+    counts=True — итератор отдаёт уже готовые частоты терминов (например, посчитанные
+    по окнам полного текста, см. lacuna_windows), а не тексты.
+    Возвращает (матрица, [[(термин, вес), ...] по документам]) и, при return_idf=True,
+    третьим элементом веса IDF столбцов (нули вне отобранных max_features).
+    """
+    stop = set(stop_words or ())
+    
+    def batches():
+        if counts:
+            return _batches(texts(), batch_size)
+        return _map_counts(texts(), batch_size, workers)
+
+    # Проход 1: документная и общая частота столбцов
+    df = np.zeros(n_features, dtype=np.int64)
+    totals = np.zeros(n_features, dtype=np.int64)
+    n_docs = 0
+    for batch in batches():
+        for doc in batch:
+            cols = np.fromiter((hash_term(t, n_features) for t in doc), dtype=np.int64, count=len(doc))
+            np.add.at(totals, cols, np.fromiter(doc.values(), dtype=np.int64, count=len(doc)))
+            df[np.unique(cols)] += 1
+        n_docs += len(batch)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+    mask = _top_columns(totals, max_features)
+    keyword_mask = _top_columns(totals, keyword_features, {hash_term(t, n_features) for t in stop})
+    del df, totals
+
+    # Проход 2: TF-IDF-строки с L2-нормировкой, сразу на диск
+    if directory is not None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = {name: directory / f"{name}.bin" for name in ("data", "indices", "indptr")}
+        out = {name: open(path, 'wb') for name, path in paths.items()}
+    else:
+        out = {"data": array('d'), "indices": array('i'), "indptr": array('q')}
+
+    def emit(name, values, typecode):
+        if directory is not None:
+            _append_raw(out[name], values, typecode)
+        else:
+            out[name].extend(values)
+
+    doc_keywords = []
+    nnz = 0
+    emit("indptr", [0], 'q')
+    try:
+        for batch in batches():
+            for doc in batch:
+                merged = Counter()
+                for term, count in doc.items():
+                    merged[hash_term(term, n_features)] += count
+                cols, values = _weigh(merged, mask, idf)
+                emit("data", values.tolist(), 'd')
+                emit("indices", cols.tolist(), 'i')
+                nnz += len(cols)
+                emit("indptr", [nnz], 'q')
+
+                if keywords:
+                    cols, values = _weigh(merged, keyword_mask, idf)
+                    weight = dict(zip(cols.tolist(), values.tolist()))
+                    candidates = []
+                    for term in doc:
+                        col = hash_term(term, n_features)
+                        if term not in stop and col in weight:
+                            candidates.append((weight[col], term))
+                    top = heapq.nlargest(keywords, candidates, key=lambda item: item[0])
+                    doc_keywords.append([(term, score) for score, term in top])
+    finally:
+        if directory is not None:
+            for f in out.values():
+                f.close()
+
+    if directory is not None:
+        data = _load_raw(paths["data"], np.float64)
+        indices = _load_raw(paths["indices"], np.int32)
+        indptr = _load_raw(paths["indptr"], np.int64)
+    else:
+        data = np.frombuffer(out["data"], dtype=np.float64)
+        indices = np.frombuffer(out["indices"], dtype=np.int32)
+        indptr = np.frombuffer(out["indptr"], dtype=np.int64)
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=(n_docs, n_features), copy=False)
+    if return_idf:
+        return matrix, doc_keywords, np.where(mask, idf, 0.0)
+    return matrix, doc_keywords
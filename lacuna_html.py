@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+ПОТОКОВАЯ ЗАПИСЬ HTML-ОТЧЁТА
+Разделы пишутся в файл сразу, без сборки всей страницы в памяти. Большие
+таблицы разбиваются на страницы: первая встраивается в HTML, остальные
+ложатся рядом отдельными файлами-чанками и подгружаются кнопкой «Показать
+ещё» через <script> (работает и для отчёта, открытого как file://).
+"""
+
+import json
+from html import escape
+from pathlib import Path
+
+PAGE_SIZE = 200  # Строк таблицы на страницу (чанк)
+
+PAGER_SCRIPT = """<script>
+var LACUNA_TABLES = {};
+function lacunaChunk(table, page, rows) {
+    document.getElementById(table + "-body").insertAdjacentHTML("beforeend", rows.join(""));
+    var t = LACUNA_TABLES[table];
+    t.loading = false;
+    document.getElementById(table + "-status").textContent = "Показано страниц: " + (page + 1) + " из " + t.pages;
+    if (page + 1 >= t.pages) { document.getElementById(table + "-more").style.display = "none"; }
+}
+function lacunaMore(table) {
+    var t = LACUNA_TABLES[table];
+    if (t.loading || t.next >= t.pages) { return; }
+    t.loading = true;
+    var s = document.createElement("script");
+    s.src = t.dir + "/" + table + "_" + t.next + ".js";
+    t.next += 1;
+    document.body.appendChild(s);
+}
+</script>
+"""
+
+class ReportWriter:
+    """
+    Пишет HTML-отчёт по частям:
+        with ReportWriter(path, data_dir) as report:
+            report.write("<header>...</header>")
+            report.table("files", ["Имя", "Размер"], rows)   # rows — итератор готовых <tr>
+    Чанки таблиц кладутся в data_dir как <таблица>_<страница>.js.
+    """
+
+    def __init__(self, path, data_dir, page_size=PAGE_SIZE, chunk_prefix="00_"):
+        self.path = Path(path)
+        self.data_dir = Path(data_dir)
+        self.page_size = page_size
+        self.chunk_prefix = chunk_prefix
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        for old in self.data_dir.glob(f"{chunk_prefix}*.js"):
+            old.unlink()
+        self._f = open(self.path, 'w', encoding='utf-8')
+        self._script_written = False
+
+    def write(self, text):
+        self._f.write(text)
+
+    def table(self, name, headers, rows, empty="Нет данных"):
+        """
+        Таблица с постраничной подгрузкой. rows — итератор строк <tr>...</tr>;
+        читается один раз, в памяти одновременно не больше одной страницы.
+        """
+        if not self._script_written:
+            self.write(PAGER_SCRIPT)
+            self._script_written = True
+        table = self.chunk_prefix + name
+        directory = escape(self.data_dir.relative_to(self.path.parent).as_posix()
+                           if self.data_dir.is_relative_to(self.path.parent) else self.data_dir.as_uri())
+        self.write(f'<table><thead><tr>{"".join(f"<th>{escape(h)}</th>" for h in headers)}</tr></thead>'
+                   f'<tbody id="{table}-body">')
+        pages = 0
+        page = []
+        total = 0
+        for row in rows:
+            page.append(row)
+            total += 1
+            if len(page) == self.page_size:
+                self._flush_page(table, pages, page)
+                pages += 1
+                page = []
+        if page or not pages:
+            self._flush_page(table, pages, page)
+            pages += 1
+        if not total:
+            self.write(f'<tr><td colspan="{len(headers)}"><em>{escape(empty)}</em></td></tr>')
+        self.write("</tbody></table>")
+        if pages > 1:
+            self.write(f'<div class="pager"><span id="{table}-status">Показано страниц: 1 из {pages}</span> '
+                       f'<button id="{table}-more" onclick="lacunaMore(\'{table}\')">Показать ещё</button></div>'
+                       f'<script>LACUNA_TABLES["{table}"] = {{dir: "{directory}", next: 1, pages: {pages}}};</script>')
+        return total
+
+    def _flush_page(self, table, number, rows):
+        if number == 0:
+            # Первая страница — прямо в HTML
+            self.write("".join(rows))
+            return
+        chunk = self.data_dir / f"{table}_{number}.js"
+        with open(chunk, 'w', encoding='utf-8') as f:
+            f.write(f"lacunaChunk({json.dumps(table)}, {number}, {json.dumps(rows, ensure_ascii=False)});\n")
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
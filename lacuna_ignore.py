@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+ПРАВИЛА ИГНОРИРОВАНИЯ
+Общий движок для индексатора и мега-анализатора: шаблоны в стиле .gitignore
+(плюс проектный .lacunaignore), отсечение целых папок прямо при обходе и
+распознавание бинарных файлов по первым байтам.
+"""
+
+import os
+import re
+from pathlib import Path
+
+IGNORE_FILE_NAME = ".lacunaignore"  # Проектный файл игнорирования (синтаксис .gitignore)
+
+# Всегда игнорируем служебные папки систем контроля версий и кэши
+DEFAULT_PATTERNS = [".git/", ".hg/", ".svn/", "__pycache__/"]
+
+# Заведомо бинарные расширения: такие файлы даже не открываются
+BINARY_EXTENSIONS = {
+    ".pack", ".idx", ".rev", ".pyc", ".pyo", ".so", ".dll", ".exe", ".bin",
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp",
+    ".pdf", ".zip", ".gz", ".bz2", ".xz", ".7z", ".rar", ".tar",
+    ".mp3", ".wav", ".ogg", ".flac", ".mp4", ".avi", ".mkv",
+    ".woff", ".woff2", ".ttf", ".otf", ".db", ".sqlite",
+}
+
+SNIFF_BYTES = 1024  # Сколько байт читать для распознавания бинарника
+TEXT_BOMS = (b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff")
+_TEXT_CONTROL = {7, 8, 9, 10, 12, 13, 27}
+
+def _translate(pattern):
+    """Переводит тело шаблона .gitignore в регулярное выражение для пути с '/'."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**/", i):
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern.startswith("**", i):
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts)
+
+class IgnoreRules:
+    """
+    Набор скомпилированных правил. Как и в git, побеждает последнее
+    совпавшее правило, '!' возвращает путь обратно. Правила из вложенных
+    .gitignore действуют только внутри своей папки (base).
+    """
+
+    def __init__(self, patterns=DEFAULT_PATTERNS):
+        self._rules = []  # (base, regex, negate, dir_only)
+        self._has_negation = False
+        self.nested_loaded = set()  # папки, чей .gitignore уже подхвачен при обходе
+        self.add_patterns(patterns)
+
+    def add_patterns(self, lines, base=""):
+        """Добавляет шаблоны; base — папка (с '/' на конце), от которой они считаются."""
+        for line in lines:
+            line = line.rstrip("\n\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # Шаблон со слэшем в начале или середине привязан к base,
+            # без слэша — совпадает с именем на любой глубине
+            anchored = "/" in line
+            body = _translate(line.lstrip("/"))
+            regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$", re.DOTALL)
+            self._rules.append((base, regex, negate, dir_only))
+            self._has_negation = self._has_negation or negate
+
+    def add_file(self, path, base=""):
+        """Загружает правила из файла (если он есть). Возвращает True, если файл прочитан."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                self.add_patterns(f.readlines(), base)
+        except OSError:
+            return False
+        return True
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """Проверяет путь относительно корня (через '/')."""
+        if not self._has_negation:
+            # Без отрицаний порядок неважен — достаточно первого совпадения
+            for base, regex, _, dir_only in self._rules:
+                if dir_only and not is_dir:
+                    continue
+                if rel_path.startswith(base) and regex.match(rel_path[len(base):]):
+                    return True
+            return False
+
+        ignored = False
+        for base, regex, negate, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if rel_path.startswith(base) and regex.match(rel_path[len(base):]):
+                ignored = not negate
+        return ignored
+
+    def is_path_ignored(self, rel_path, is_dir=False):
+        """
+        Как is_ignored, но учитывает и все родительские папки — для одиночных
+        путей вне обхода (например, событий наблюдателя).
+        """
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            if self.is_ignored("/".join(parts[:depth]), is_dir=True):
+                return True
+        return self.is_ignored(rel_path, is_dir)
+
+def load_rules(root):
+    """Правила по умолчанию + корневой .gitignore + проектный .lacunaignore."""
+    root = Path(root)
+    rules = IgnoreRules()
+    rules.add_file(root / ".gitignore")
+    rules.add_file(root / IGNORE_FILE_NAME)
+    return rules
+
+def is_binary(path, extension=None):
+    """
+    Распознаёт бинарный файл: сначала по расширению (без открытия файла),
+    затем по первым SNIFF_BYTES байтам — нулевые байты или много управляющих символов.
+    """
+    if extension is None:
+        extension = os.path.splitext(path)[1].lower()
+    if extension in BINARY_EXTENSIONS:
+        return True
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return False
+    return is_binary_bytes(head)
+
+def is_binary_bytes(head):
+    """Та же эвристика для уже прочитанного начала файла."""
+    if not head or head.startswith(TEXT_BOMS):
+        return False
+    if b"\0" in head:
+        return True
+    control = sum(1 for b in head if b < 32 and b not in _TEXT_CONTROL)
+    return control / len(head) > 0.3
+
+def walk_files(root, rules=None, skip_binary=True, nested=True, prefix=""):
+    """
+    Обходит дерево и отдаёт пары (Path, stat) для неигнорируемых файлов.
+    Игнорируемые папки отсекаются целиком и не читаются; вложенные
+    .gitignore подхватываются по ходу обхода (nested=True).
+    Для обхода поддерева root — сама папка, prefix — её путь от корня с '/' на конце.
+    """
+    root = Path(root)
+    if rules is None:
+        rules = load_rules(root)
+
+    stack = [(root, prefix)]
+    while stack:
+        directory, prefix = stack.pop()
+        if nested and prefix and prefix not in rules.nested_loaded:
+            rules.nested_loaded.add(prefix)
+            rules.add_file(directory / ".gitignore", prefix)
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = prefix + entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if rules.is_ignored(rel_path, is_dir):
+                continue
+            if is_dir:
+                subdirs.append((Path(entry.path), rel_path + "/"))
+                continue
+            if skip_binary and is_binary(entry.path):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            yield Path(entry.path), stat
+
+        # Обратный порядок, чтобы папки обходились в порядке scandir
+        stack.extend(reversed(subdirs))
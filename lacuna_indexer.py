@@ -9,30 +9,48 @@
 import os
 import sys
 import json
+import argparse
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+import lacuna_decode
+import lacuna_dedup
+import lacuna_ignore
+import lacuna_jsonl
+import lacuna_metrics
+import lacuna_store
+import lacuna_watch
+
 # Конфигурация
 REPO_ROOT = Path("E:/AGI/-_-")  # Путь к репозиторию лакун
 INDEX_FILE = REPO_ROOT / "00_LACUNA_INDEX.json"  # Файл индекса (JSON)
 REPORT_FILE = REPO_ROOT / "00_LACUNA_REPORT.md"   # Отчёт в человекочитаемом формате
+MANIFEST_FILE = REPO_ROOT / "00_LACUNA_MANIFEST.json"  # Манифест (размер, mtime, inode, файл индекса) прошлого прогона
+JSONL_FILE = REPO_ROOT / "00_LACUNA_INDEX.jsonl"  # Потоковый индекс (JSON Lines)
+DB_FILE = REPO_ROOT / "00_LACUNA_INDEX.sqlite"  # SQLite/FTS5-хранилище для запросов (lacuna_store.py)
+PREVIEW_READ_CHARS = 4096  # Сколько символов начала файла читать ради трёх строк предпросмотра
+GENERATED_BY = "lacuna_indexer.py (режим 'сладкой мякоти')"
 
-def analyze_file(file_path):
-    """Анализирует файл лакуны и возвращает метаданные."""
-    stat = file_path.stat()
+def analyze_file(file_path, stat=None, encoding=None):
+    """
+    Анализирует файл лакуны и возвращает метаданные.
+    encoding — кодировка из прошлого индекса (подсказка для lacuna_decode).
+    """
+    if stat is None:
+        stat = file_path.stat()
     
-    # Читаем первые 3 строки для предпросмотра
+    # Читаем первые 3 строки для предпросмотра (байты читаются один раз, кодировка определяется по ним)
     preview = ""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            preview_lines = []
-            for _ in range(3):
-                line = f.readline().strip()
-                if line:
-                    preview_lines.append(line)
-            preview = " | ".join(preview_lines[:3])
-    except:
+        head, encoding = lacuna_decode.read_text(file_path, limit=PREVIEW_READ_CHARS, hint=encoding)
+        preview_lines = [line.strip() for line in head.split('\n', 3)[:3]]
+        preview = " | ".join(line for line in preview_lines if line)
+    except OSError:
         preview = "[невозможно прочитать]"
+        encoding = None
     
     return {
         "name": file_path.name,
@@ -40,49 +58,237 @@ def analyze_file(file_path):
         "size_bytes": stat.st_size,
         "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
         "preview": preview,
-        "extension": file_path.suffix.lower()
+        "extension": file_path.suffix.lower(),
+        "encoding": encoding
     }
 
-def main():
-    print(f"[*] Индексация лакун в {REPO_ROOT}")
-    
-    if not REPO_ROOT.exists():
-        print(f"[!] Ошибка: путь {REPO_ROOT} не существует!")
-        return 1
+def iter_files(rules=None, directory=None):
+    """
+    Обходит репозиторий (или его подпапку directory) и отдаёт пары (путь, stat)
+    для всех файлов лакун. Папки из .gitignore/.lacunaignore (и .git)
+    отсекаются при обходе, бинарники пропускаются.
+    """
+    prefix = ""
+    if directory is not None and directory != REPO_ROOT:
+        prefix = directory.relative_to(REPO_ROOT).as_posix() + "/"
+    for file_path, stat in lacuna_ignore.walk_files(directory or REPO_ROOT, rules, prefix=prefix):
+        if not file_path.name.startswith("00_"):
+            yield file_path, stat
+
+def file_signature(stat):
+    """Подпись файла для манифеста: размер, время изменения (нс) и inode."""
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+def load_json(path):
+    """Читает JSON-файл; при отсутствии или повреждении возвращает None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def analyze_many(jobs, workers=1):
+    """
+    Лениво анализирует пары (путь, stat) — или тройки (путь, stat, кодировка-подсказка) —
+    и отдаёт пары (запись, stat).
+    При workers > 1 вызовы analyze_file раздаются ограниченному пулу потоков
+    (stat/open упираются в задержки диска, а не в GIL). Порядок результатов
+    всегда совпадает с порядком jobs, поэтому агрегаты детерминированы.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield analyze_file(*job), job[1]
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(lambda job: (analyze_file(*job), job[1]), jobs)
+
+def scan_full(manifest, workers=1, rules=None):
+    """Полная индексация: лениво анализирует каждый файл заново, заполняя манифест."""
+    for data, stat in analyze_many(iter_files(rules), workers):
+        manifest[data["path"]] = file_signature(stat)
+        lacuna_metrics.add_files(1, stat.st_size)
+        yield data
+
+def load_previous_records(jsonl=False):
+    """Записи прошлого индекса по путям (из JSON или JSONL) или None, если индекса нет."""
+    if jsonl:
+        if not JSONL_FILE.exists():
+            return None
+        records, digests = {}, {}
+        for record in lacuna_jsonl.iter_records(JSONL_FILE):
+            kind = record.pop("type", None)
+            if kind == "file":
+                records[record["path"]] = record
+            elif kind == "summary":
+                digests = record.get("digests", {})
+        # Дайджесты, посчитанные уже после записи строк файлов, лежат в сводке
+        for path, digest in digests.items():
+            if path in records:
+                records[path].setdefault("digest", digest)
+        return records
+    old_index = load_json(INDEX_FILE)
+    if old_index is None:
+        return None
+    return {f["path"]: f for f in old_index.get("files", [])}
+
+def scan_incremental(workers=1, jsonl=False, rules=None):
+    """
+    Инкрементальная индексация по манифесту прошлого прогона.
+    Перечитываются только новые и изменённые файлы, удалённые выбрасываются,
+    остальные записи берутся из существующего индекса.
+    Возвращает: (файлы, манифест, изменено, удалено)
+    """
+    old = load_json(MANIFEST_FILE) or {}
+    # Манифест описывает индекс, записанный последним; если тогда писался другой
+    # формат (JSON против JSONL), записи нашего индекса могут быть старше манифеста
+    index_file = JSONL_FILE if jsonl else INDEX_FILE
+    old_manifest = old.get("files", {}) if old.get("index") == index_file.name else {}
+    old_records = load_previous_records(jsonl)
     
-    # Собираем все файлы
     files = []
+    manifest = {}
+    pending = []  # (позиция в files, путь, stat, прошлая кодировка) для перечитывания
+    for file_path, stat in iter_files(rules):
+        rel_path = str(file_path.relative_to(REPO_ROOT))
+        signature = file_signature(stat)
+        manifest[rel_path] = signature
+        
+        data = (old_records or {}).get(rel_path)
+        if data is None or old_manifest.get(rel_path) != signature:
+            pending.append((len(files), file_path, stat, (data or {}).get("encoding")))
+        files.append(data)
+    
+    results = analyze_many([job[1:] for job in pending], workers)
+    for (pos, *_), (data, stat) in zip(pending, results):
+        files[pos] = data
+        lacuna_metrics.add_files(1, stat.st_size)
+    changed = len(pending)
+    
+    removed = len(old_manifest.keys() - manifest.keys())
+    if old_records is None:
+        # Без старого индекса сливать не с чем — результат равен полному прогону
+        changed = max(changed, 1)
+    return files, manifest, changed, removed
+
+def build_index(files):
+    """Собирает индекс (со статистикой по расширениям) из списка записей файлов."""
     extensions = {}
     total_size = 0
-    
-    for file_path in REPO_ROOT.rglob("*"):
-        if file_path.is_file() and not file_path.name.startswith("00_"):
-            data = analyze_file(file_path)
-            files.append(data)
-            
-            # Статистика по расширениям
-            ext = data["extension"]
-            extensions[ext] = extensions.get(ext, 0) + 1
-            total_size += data["size_bytes"]
+    for data in files:
+        # Статистика по расширениям
+        ext = data["extension"]
+        extensions[ext] = extensions.get(ext, 0) + 1
+        total_size += data["size_bytes"]
     
     # Сортируем по дате изменения (новые сверху)
     files.sort(key=lambda x: x["modified"], reverse=True)
     
-    # Формируем индекс
-    index = {
+    return {
         "generated_at": datetime.now().isoformat(),
-        "generated_by": "lacuna_indexer.py (режим 'сладкой мякоти')",
+        "generated_by": GENERATED_BY,
         "total_files": len(files),
         "total_size_bytes": total_size,
         "extensions": extensions,
+        "duplicates": lacuna_dedup.find_duplicates(files, REPO_ROOT),
         "files": files
     }
+
+class ReportDigest:
+    """
+    Всё, что нужно отчёту, за один проход по записям: топ свежих файлов,
+    файлы с 'ВИРУС' и лакуны. Полный список файлов при этом не хранится.
+    """
+    TOP = 50
+
+    def __init__(self, files=()):
+        self.total = 0
+        self._recent = []  # мин-куча (modified, -порядковый номер, запись)
+        self._virus = []
+        self._lacuna = []
+        for data in files:
+            self.add(data)
+
+    def add(self, data):
+        # -total сохраняет порядок обхода среди файлов с одинаковой датой
+        entry = (data["modified"], -self.total, data)
+        if len(self._recent) < self.TOP:
+            heapq.heappush(self._recent, entry)
+        else:
+            heapq.heappushpop(self._recent, entry)
+        if 'ВИРУС' in data['preview'].upper():
+            self._virus.append(entry)
+        if 'lacuna' in data['name'].lower():
+            self._lacuna.append(entry)
+        self.total += 1
+
+    @staticmethod
+    def _newest_first(entries):
+        return [entry[2] for entry in sorted(entries, reverse=True)]
+
+    @property
+    def recent(self):
+        return self._newest_first(self._recent)
+
+    @property
+    def virus(self):
+        return self._newest_first(self._virus)
+
+    @property
+    def lacuna(self):
+        return self._newest_first(self._lacuna)
+
+def write_jsonl_index(records):
+    """
+    Потоково пишет индекс в JSONL по мере поступления записей.
+    Возвращает (сводка индекса без списка файлов, дайджест для отчёта).
+    Записи идут в порядке обхода, а не по дате изменения; группы дубликатов
+    попадают в итоговую сводку. Дайджест, известный заранее (из прошлого индекса),
+    пишется в строку файла; посчитанные при поиске дубликатов — в сводку ("digests"),
+    откуда их берёт следующий прогон. Они же возвращаются в сводке индекса.
+    """
+    generated_at = datetime.now().isoformat()
+    extensions = {}
+    total_size = 0
+    digest = ReportDigest()
+    sizes = []  # лёгкие (путь, размер, дайджест) для поиска дубликатов в конце
+    fresh = []  # те из них, у которых дайджеста ещё нет
+    with lacuna_jsonl.JsonlIndexWriter(JSONL_FILE, generated_at=generated_at,
+                                       generated_by=GENERATED_BY,
+                                       repo_path=str(REPO_ROOT)) as writer:
+        for data in records:
+            writer.write(data)
+            digest.add(data)
+            light = {"path": data["path"], "size_bytes": data["size_bytes"]}
+            if "digest" in data:
+                light["digest"] = data["digest"]
+            else:
+                fresh.append(light)
+            sizes.append(light)
+            ext = data["extension"]
+            extensions[ext] = extensions.get(ext, 0) + 1
+            total_size += data["size_bytes"]
+        
+        summary = {
+            "total_files": digest.total,
+            "total_size_bytes": total_size,
+            "extensions": extensions,
+            "duplicates": lacuna_dedup.find_duplicates(sizes, REPO_ROOT)
+        }
+        summary["digests"] = {light["path"]: light["digest"] for light in fresh if "digest" in light}
+        writer.close(**summary)
     
-    # Сохраняем JSON индекс
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
-    
-    # Создаём человекочитаемый отчёт
+    return {"generated_at": generated_at, "generated_by": GENERATED_BY, **summary}, digest
+
+def save_manifest(manifest, index_file):
+    """Сохраняет манифест для следующего инкрементального прогона вместе с именем файла индекса."""
+    with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"version": 1, "index": index_file.name, "files": manifest}, f, ensure_ascii=False)
+
+def write_report(index, digest=None):
+    """Создаёт человекочитаемый отчёт по индексу (или по сводке + дайджесту)."""
+    if digest is None:
+        digest = ReportDigest(index["files"])
+    extensions = index["extensions"]
     with open(REPORT_FILE, 'w', encoding='utf-8') as f:
         f.write("# АНАЛИТИЧЕСКИЙ ОТЧЁТ ПО РЕПОЗИТОРИЮ ЛАКУН\n\n")
         f.write(f"Сгенерировано: {index['generated_at']}\n")
@@ -97,31 +303,239 @@ def main():
         f.write("| Имя | Размер | Изменён | Предпросмотр |\n")
         f.write("|-----|--------|---------|--------------|\n")
         
-        for file_data in files[:50]:  # Ограничим таблицу 50 строками
+        for file_data in digest.recent:  # Ограничим таблицу 50 строками
             name = file_data['name']
             size = f"{file_data['size_bytes']} б"
             modified = file_data['modified'][:16].replace('T', ' ')
             preview = file_data['preview'][:100].replace('|', '∣')  # Заменяем разделитель
             f.write(f"| `{name}` | {size} | {modified} | {preview} |\n")
         
-        if len(files) > 50:
-            f.write(f"\n... и ещё {len(files) - 50} файлов.\n")
+        if digest.total > ReportDigest.TOP:
+            f.write(f"\n... и ещё {digest.total - ReportDigest.TOP} файлов.\n")
         
         f.write("\n## Скрытые связи\n")
         f.write("### Файлы, помеченные 'ВИРУС':\n")
-        virus_files = [f for f in files if 'ВИРУС' in f['preview'].upper()]
-        for vf in virus_files:
+        for vf in digest.virus:
             f.write(f"- `{vf['name']}`: {vf['preview']}\n")
         
         f.write("\n### Файлы-лакуны с незавершённостями:\n")
-        lacuna_files = [f for f in files if 'lacuna' in f['name'].lower()]
-        for lf in lacuna_files:
+        for lf in digest.lacuna:
             f.write(f"- `{lf['name']}`: {lf['preview']}\n")
+        
+        duplicates = index.get("duplicates", [])
+        f.write(f"\n### Дубликаты (одинаковое содержимое): {len(duplicates)} групп\n")
+        for group in duplicates:
+            paths = ", ".join(f"`{path}`" for path in group["paths"])
+            f.write(f"- {group['size_bytes']} б × {len(group['paths'])}: {paths}\n")
+
+def write_outputs(records, manifest, jsonl=False, sqlite=False):
+    """
+    Пишет индекс (JSON или JSONL), манифест, отчёт и (по желанию) SQLite-хранилище.
+    Возвращает (индекс, дайджест, файл индекса).
+    """
+    if jsonl:
+        # Записи уходят на диск по мере анализа, в памяти только дайджест
+        index, digest = write_jsonl_index(records)
+        index_file = JSONL_FILE
+    else:
+        # Формируем индекс
+        index = build_index(list(records))
+        digest = ReportDigest(index["files"])
+        index_file = INDEX_FILE
+        
+        # Сохраняем JSON индекс
+        with open(INDEX_FILE, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+    save_manifest(manifest, index_file)
+    
+    # Создаём человекочитаемый отчёт
+    write_report(index, digest)
+    
+    if sqlite:
+        # В режиме JSONL записи уже на диске — перечитываем их лениво (свежие дайджесты — из сводки)
+        if jsonl:
+            digests = index["digests"]
+            source = (dict(data, digest=digests.get(data["path"], data.get("digest")))
+                      for data in lacuna_jsonl.iter_files(JSONL_FILE))
+        else:
+            source = index["files"]
+        with lacuna_metrics.stage("sqlite"), lacuna_store.LacunaStore(DB_FILE) as store:
+            updated, removed = store.sync(source, manifest, REPO_ROOT)
+            lacuna_metrics.count("sqlite_updated", updated)
+            lacuna_metrics.count("sqlite_removed", removed)
+        print(f"[+] SQLite: обновлено {updated}, удалено {removed} ({DB_FILE.name})")
+    return index, digest, index_file
+
+def apply_changes(records, manifest, paths, rules):
+    """
+    Точечно применяет изменения путей к записям (путь -> запись) и манифесту.
+    Существующий файл перечитывается, исчезнувший путь удаляется вместе со всем,
+    что под ним лежало, а появившаяся папка обходится целиком.
+    Возвращает число изменённых записей.
+    """
+    changed = 0
+    for path in sorted(paths):
+        rel_path = str(path.relative_to(REPO_ROOT)) if path != REPO_ROOT else ""
+        
+        posix_path = path.relative_to(REPO_ROOT).as_posix() if rel_path else ""
+        
+        if path.is_dir() and rel_path and rules.is_path_ignored(posix_path, is_dir=True):
+            # Игнорируемая папка (venv/, node_modules/...): walk_files не фильтрует сам корень обхода
+            gone = [key for key in records if key.startswith(rel_path + os.sep)]
+        elif path.is_dir():
+            # Новая/перемещённая папка (или переполнение очереди для корня)
+            seen = set()
+            for file_path, stat in iter_files(rules, path):
+                key = str(file_path.relative_to(REPO_ROOT))
+                seen.add(key)
+                signature = file_signature(stat)
+                if manifest.get(key) != signature:
+                    records[key] = analyze_file(file_path, stat, (records.get(key) or {}).get("encoding"))
+                    manifest[key] = signature
+                    changed += 1
+            gone = [key for key in records if key not in seen and
+                    (not rel_path or key.startswith(rel_path + os.sep))]
+        elif path.is_file():
+            if (path.name.startswith("00_") or rules.is_path_ignored(posix_path)
+                    or lacuna_ignore.is_binary(path)):
+                gone = [rel_path] if rel_path in records else []
+            else:
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                signature = file_signature(stat)
+                if manifest.get(rel_path) != signature:
+                    records[rel_path] = analyze_file(path, stat, (records.get(rel_path) or {}).get("encoding"))
+                    manifest[rel_path] = signature
+                    changed += 1
+                gone = []
+        else:
+            # Путь исчез: файл или целая папка
+            gone = [key for key in records
+                    if key == rel_path or key.startswith(rel_path + os.sep)]
+        
+        for key in gone:
+            records.pop(key, None)
+            manifest.pop(key, None)
+            changed += 1
+    return changed
+
+def remember_digests(records, index):
+    """
+    Переносит дайджесты, посчитанные при записи JSONL-индекса, в записи в памяти,
+    чтобы следующая пачка изменений не хешировала те же файлы заново.
+    """
+    for path, digest in index.get("digests", {}).items():
+        if path in records:
+            records[path]["digest"] = digest
+
+def watch(args):
+    """
+    Долгоживущий режим: синхронизирует индекс инкрементально, затем следит за
+    репозиторием и применяет изменения по отдельным файлам, без полного пересканирования.
+    """
+    rules = lacuna_ignore.load_rules(REPO_ROOT)
+    files, manifest, changed, removed = scan_incremental(args.workers, args.jsonl, rules)
+    records = {data["path"]: data for data in files}
+    if changed or removed:
+        remember_digests(records, write_outputs(list(records.values()), manifest, args.jsonl, args.sqlite)[0])
+    
+    watcher = lacuna_watch.make_watcher(REPO_ROOT, rules, polling=args.polling,
+                                        interval=args.poll_interval)
+    mode = "опрос" if isinstance(watcher, lacuna_watch.PollingWatcher) else "inotify"
+    print(f"[*] Наблюдение за {REPO_ROOT} ({mode}), файлов: {len(records)}. Ctrl+C — выход.")
+    try:
+        for paths in lacuna_watch.batches(watcher, debounce=args.debounce):
+            started = time.monotonic()
+            count = apply_changes(records, manifest, paths, rules)
+            if not count:
+                continue
+            remember_digests(records, write_outputs(list(records.values()), manifest, args.jsonl, args.sqlite)[0])
+            elapsed = (time.monotonic() - started) * 1000
+            print(f"[+] {datetime.now():%H:%M:%S} обновлено записей: {count}, "
+                  f"всего файлов: {len(records)} ({elapsed:.0f} мс)")
+    except KeyboardInterrupt:
+        print("\n[*] Наблюдение остановлено.")
+    finally:
+        watcher.close()
+    return 0
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(description="Индексатор репозитория лакун")
+    parser.add_argument("--incremental", action="store_true",
+                        help="перечитывать только новые и изменённые файлы (по манифесту)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число потоков для analyze_file (1 = последовательно)")
+    parser.add_argument("--jsonl", action="store_true",
+                        help=f"писать потоковый индекс {JSONL_FILE.name} вместо JSON")
+    parser.add_argument("--sqlite", action="store_true",
+                        help=f"обновлять SQLite/FTS5-хранилище {DB_FILE.name} (запросы: lacuna_store.py)")
+    parser.add_argument("--watch", action="store_true",
+                        help="следить за репозиторием и обновлять индекс и отчёт на лету")
+    parser.add_argument("--debounce", type=float, default=0.2,
+                        help="пауза (сек), после которой пачка событий применяется")
+    parser.add_argument("--polling", action="store_true",
+                        help="следить опросом вместо inotify")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="период опроса (сек) для --polling")
+    parser.add_argument("--metrics", type=Path,
+                        help="записать метрики прогона (время, CPU, память, файлы, байты) в JSON-файл")
+    parser.add_argument("--profile", type=Path,
+                        help="записать профиль cProfile прогона в этот файл")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="мерить пик памяти Python по стадиям (tracemalloc, замедляет прогон)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"[*] Индексация лакун в {REPO_ROOT}")
+    
+    if not REPO_ROOT.exists():
+        print(f"[!] Ошибка: путь {REPO_ROOT} не существует!")
+        return 1
+    
+    if args.watch:
+        return watch(args)
+    
+    metrics = lacuna_metrics.Metrics("lacuna_indexer", trace_memory=args.trace_memory, argv=argv)
+    with metrics, lacuna_metrics.profiled(args.profile):
+        status = index_once(args)
+    print("\n[=] Стадии:")
+    metrics.print_summary()
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"[+] Метрики: {args.metrics}")
+    return status
+
+def index_once(args):
+    """Один прогон индексации (полный или инкрементальный) с выводом сводки."""
+    # Собираем все файлы
+    manifest = {}
+    if args.incremental:
+        with lacuna_metrics.stage("scan"):
+            records, manifest, changed, removed = scan_incremental(args.workers, args.jsonl)
+        lacuna_metrics.count("changed", changed)
+        lacuna_metrics.count("removed", removed)
+        print(f"[*] Инкрементальный режим: изменено {changed}, удалено {removed}")
+        if not changed and not removed and not (args.sqlite and not DB_FILE.exists()):
+            print("[=] Изменений нет, индекс актуален.")
+            return 0
+    else:
+        records = scan_full(manifest, args.workers)
+    
+    # При полном прогоне файлы читаются лениво по ходу записи — стадия index включает обход
+    with lacuna_metrics.stage("index"):
+        index, digest, index_file = write_outputs(records, manifest, args.jsonl, args.sqlite)
+    extensions = index["extensions"]
+    total_size = index["total_size_bytes"]
     
-    print(f"[+] Создан индекс: {INDEX_FILE}")
+    print(f"[+] Создан индекс: {index_file}")
     print(f"[+] Создан отчёт: {REPORT_FILE}")
-    print(f"[+] Проанализировано файлов: {len(files)}")
+    print(f"[+] Проанализировано файлов: {index['total_files']}")
     print(f"[+] Общий размер: {total_size} байт")
+    print(f"[+] Групп дубликатов: {len(index['duplicates'])}")
     
     # Краткий вывод в консоль
     print("\n--- КРАТКАЯ СТАТИСТИКА ---")
@@ -129,7 +543,7 @@ def main():
     
     # Самые новые файлы
     print("\n5 самых свежих лакун:")
-    for i, file_data in enumerate(files[:5]):
+    for i, file_data in enumerate(digest.recent[:5]):
         print(f"{i+1}. {file_data['name']} ({file_data['modified'][:10]}) - {file_data['preview'][:60]}...")
     
     return 0
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+ПОТОКОВЫЙ ИНДЕКС (JSON Lines)
+Одна JSON-запись на строку: заголовок, записи файлов, итоговая сводка.
+Пишется по мере анализа и читается лениво — память не зависит от размера репозитория.
+"""
+
+import json
+
+FORMAT_VERSION = 1
+
+class JsonlIndexWriter:
+    """
+    Пишет индекс построчно:
+        {"type": "header", ...}
+        {"type": "file", ...}   × N
+        {"type": "summary", ...}
+    Каждая строка сбрасывается на диск сразу, так что потребители могут
+    читать файл, пока индексация ещё идёт.
+    """
+
+    def __init__(self, path, **header):
+        self.path = path
+        self.count = 0
+        self._f = open(path, 'w', encoding='utf-8')
+        self._write({"type": "header", "format_version": FORMAT_VERSION, **header})
+
+    def _write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False))
+        self._f.write("\n")
+        self._f.flush()
+
+    def write(self, record):
+        """Добавляет запись файла."""
+        self._write({"type": "file", **record})
+        self.count += 1
+
+    def close(self, **summary):
+        """Дописывает итоговую сводку и закрывает файл."""
+        if self._f.closed:
+            return
+        self._write({"type": "summary", "records": self.count, **summary})
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Без сводки файл честно считается незавершённым
+            self._f.close()
+        else:
+            self.close()
+        return False
+
+def iter_records(path):
+    """Лениво читает все записи (включая header/summary) из JSONL-индекса."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Последняя строка может быть недописана, если индексация ещё идёт
+                return
+
+def iter_files(path):
+    """Лениво отдаёт только записи файлов (без поля type)."""
+    for record in iter_records(path):
+        if record.get("type") == "file":
+            record.pop("type")
+            yield record
+
+def read_header(path):
+    """Возвращает заголовок индекса (первую строку) или None."""
+    for record in iter_records(path):
+        return record if record.get("type") == "header" else None
+    return None
+
+def read_summary(path):
+    """Возвращает итоговую сводку или None, если индекс ещё не дописан."""
+    summary = None
+    for record in iter_records(path):
+        if record.get("type") == "summary":
+            summary = record
+    return summary
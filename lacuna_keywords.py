@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+ИНВЕРТИРОВАННЫЙ ИНДЕКС КЛЮЧЕВЫХ СЛОВ
+Ключевое слово → {путь файла: вес TF-IDF}. Вопрос «какие лакуны про X» —
+один поиск в словаре, без пересчёта TF-IDF. Рядом хранится прямой индекс
+(путь → ключевые слова), поэтому изменение одного файла обновляет только
+его записи: старые веса снимаются, новые добавляются.
+
+    python lacuna_keywords.py память --limit 20
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+INDEX_VERSION = 1
+DEFAULT_INDEX = Path("E:/AGI/-_-") / "00_ANALYSIS" / "00_KEYWORD_INDEX.json"
+
+class KeywordIndex:
+    """
+    Индекс в памяти и на диске:
+        index = KeywordIndex.load(path)
+        index.set_file("a/b.lacuna", [("память", 0.61), ("время", 0.4)])
+        index.lookup("память")   # [(путь, вес), ...] по убыванию веса
+        index.save()
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self.files = {}     # путь -> {ключевое слово: вес}
+        self.keywords = {}  # ключевое слово -> {путь: вес}
+
+    @classmethod
+    def load(cls, path):
+        """Индекс из файла; если файла нет или формат устарел — пустой."""
+        index = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("version") == INDEX_VERSION:
+            index.files = data["files"]
+            index.keywords = data["keywords"]
+        return index
+
+    def remove_file(self, path):
+        """Снимает все ключевые слова файла; True, если файл был в индексе."""
+        old = self.files.pop(path, None)
+        if old is None:
+            return False
+        for keyword in old:
+            postings = self.keywords.get(keyword)
+            if postings is not None:
+                postings.pop(path, None)
+                if not postings:
+                    del self.keywords[keyword]
+        return True
+
+    def set_file(self, path, keywords):
+        """
+        Заменяет ключевые слова файла на [(слово, вес), ...].
+        Пустой список удаляет файл. True, если что-то изменилось.
+        """
+        new = {keyword: score for keyword, score in keywords}
+        if self.files.get(path) == new or (not new and path not in self.files):
+            return False
+        self.remove_file(path)
+        if new:
+            self.files[path] = new
+            for keyword, score in new.items():
+                self.keywords.setdefault(keyword, {})[path] = score
+        return True
+
+    def sync(self, file_keywords):
+        """
+        Приводит индекс к полному набору {путь: [(слово, вес), ...]}, трогая только
+        изменившиеся файлы. Возвращает (обновлено, удалено).
+        """
+        removed = [path for path in self.files if path not in file_keywords]
+        for path in removed:
+            self.remove_file(path)
+        updated = sum(self.set_file(path, keywords) for path, keywords in file_keywords.items())
+        return updated, len(removed)
+
+    def lookup(self, keyword, limit=None):
+        """Файлы с ключевым словом: [(путь, вес)] по убыванию веса."""
+        postings = self.keywords.get(keyword.lower(), {})
+        ranked = sorted(postings.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def save(self, path=None):
+        path = Path(path) if path is not None else self.path
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "files": self.files, "keywords": self.keywords},
+                      f, ensure_ascii=False)
+
+    def __len__(self):
+        return len(self.files)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Какие лакуны про заданное ключевое слово")
+    parser.add_argument("keyword", nargs="+", help="ключевые слова (ищется каждое)")
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX, help="путь к 00_KEYWORD_INDEX.json")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    args = parser.parse_args(argv)
+
+    if not args.index.exists():
+        print(f"[!] Индекс {args.index} не найден. Запустите lacuna_mega_analyzer.py connect")
+        return 1
+
+    index = KeywordIndex.load(args.index)
+    results = {keyword: index.lookup(keyword, args.limit) for keyword in args.keyword}
+    if args.json:
+        print(json.dumps({keyword: [{"path": path, "score": score} for path, score in hits]
+                          for keyword, hits in results.items()}, ensure_ascii=False, indent=2))
+        return 0
+    for keyword, hits in results.items():
+        print(f"[*] {keyword}: {len(hits)}")
+        for path, score in hits:
+            print(f"  {score:.3f}  {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+МАСШТАБИРУЕМАЯ РАСКЛАДКА ГРАФА
+Силовая раскладка Фрухтермана–Рейнгольда с приближённым отталкиванием:
+узлы раскладываются по сетке, и каждый узел отталкивается от центров масс
+клеток, а не от всех остальных узлов (O(N·клеток) вместо O(N²) за итерацию).
+Позиции сохраняются по стабильному ключу узла; следующий запуск стартует с
+них, и сдвигаются в основном новые узлы — картинка не прыгает между прогонами.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+import lacuna_metrics
+
+MAX_GRID = 24        # Клеток по стороне сетки (не больше MAX_GRID²)
+CHUNK = 4096         # Узлов за раз при расчёте отталкивания (ограничивает память)
+KNOWN_MOBILITY = 0.1 # Подвижность узлов, чьи позиции взяты из прошлой раскладки
+
+def _repulsion(pos, k, grid):
+    """Приближённое отталкивание: от центров масс клеток, своя клетка — без самого узла."""
+    n = len(pos)
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+    cell_xy = np.minimum(((pos - lo) / span * grid).astype(np.int64), grid - 1)
+    cell = cell_xy[:, 0] * grid + cell_xy[:, 1]
+
+    mass = np.bincount(cell, minlength=grid * grid).astype(np.float64)
+    sums = np.stack([np.bincount(cell, weights=pos[:, d], minlength=grid * grid) for d in (0, 1)], axis=1)
+    occupied = np.nonzero(mass)[0]
+    centers = sums[occupied] / mass[occupied, None]
+    masses = mass[occupied]
+    column = np.searchsorted(occupied, cell)
+
+    disp = np.zeros_like(pos)
+    k2 = k * k
+    for start in range(0, n, CHUNK):
+        stop = min(start + CHUNK, n)
+        rows = np.arange(stop - start)
+        dx = pos[start:stop, 0, None] - centers[None, :, 0]
+        dy = pos[start:stop, 1, None] - centers[None, :, 1]
+        weight = k2 * masses[None, :] / np.maximum(dx * dx + dy * dy, 1e-9)
+
+        # Своя клетка: центр масс остальных узлов клетки
+        own = column[start:stop]
+        weight[rows, own] = 0.0
+        own_mass = masses[own] - 1
+        has_others = own_mass > 0
+        own_center = (centers[own] * masses[own, None] - pos[start:stop]) / np.maximum(own_mass, 1)[:, None]
+        own_delta = pos[start:stop] - own_center
+        own_dist2 = np.maximum((own_delta ** 2).sum(axis=1), 1e-9)
+        own_weight = np.where(has_others, k2 * own_mass / own_dist2, 0.0)
+
+        disp[start:stop, 0] = (dx * weight).sum(axis=1)
+        disp[start:stop, 1] = (dy * weight).sum(axis=1)
+        disp[start:stop] += own_delta * own_weight[:, None]
+    return disp
+
+def force_layout(n, edges, weights=None, initial=None, mobility=None,
+                 iterations=50, k=None, seed=None):
+    """
+    Раскладка n узлов (индексы 0..n-1) по рёбрам edges [(u, v), ...].
+    initial — начальные позиции (n×2), mobility — множитель шага для каждого узла
+    (0 — узел закреплён). Возвращает массив позиций n×2.
+    """
+    rng = np.random.default_rng(seed)
+    pos = np.array(initial, dtype=np.float64) if initial is not None else rng.random((n, 2))
+    if n == 0:
+        return pos.reshape(0, 2)
+    if n == 1:
+        return pos
+    k = k or 1.0 / np.sqrt(n)
+    grid = int(min(MAX_GRID, max(1, np.sqrt(n) / 2)))
+    mobility = np.ones(n) if mobility is None else np.asarray(mobility, dtype=np.float64)
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.ones(len(edges)) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    span = np.ptp(pos, axis=0).max() or 1.0
+    temperature = 0.1 * span
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp = _repulsion(pos, k, grid)
+
+        # Притяжение вдоль рёбер (сила ~ d²/k, умноженная на вес ребра)
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+            force = delta * (dist * weights / k)[:, None]
+            np.add.at(disp, edges[:, 0], -force)
+            np.add.at(disp, edges[:, 1], force)
+
+        # Слабое притяжение к центру — несвязные компоненты не разлетаются
+        disp -= (pos - pos.mean(axis=0)) * (0.05 / k)
+
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        step = np.minimum(length, temperature) * mobility
+        pos += disp / length[:, None] * step[:, None]
+        temperature -= cooling
+    lacuna_metrics.count("layout_iterations", iterations)
+    return pos
+
+def load_positions(path):
+    """Сохранённые позиции {ключ узла: [x, y]} (пусто, если файла нет или он испорчен)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("positions", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_positions(path, positions):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"positions": positions}, f, ensure_ascii=False)
+
+def warm_layout(G, key, cache_file, iterations=50, warm_iterations=15, seed=None):
+    """
+    Раскладка графа networkx с тёплым стартом. key(node) — стабильный ключ узла
+    (например, путь файла). Узлы из прошлой раскладки стартуют со своих мест и почти
+    не двигаются; новые ставятся к уже размещённым соседям. Если новых узлов мало,
+    итераций меньше. Возвращает {узел: (x, y)} и сохраняет позиции в cache_file.
+    """
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    keys = [key(node) for node in nodes]
+    saved = load_positions(cache_file)
+    rng = np.random.default_rng(seed)
+
+    n = len(nodes)
+    known = np.array([k in saved for k in keys], dtype=bool)
+    pos = rng.random((n, 2))
+    if known.any():
+        pos[known] = [saved[k] for k, is_known in zip(keys, known) if is_known]
+        center, spread = pos[known].mean(axis=0), max(np.ptp(pos[known], axis=0).max(), 1e-3)
+        for i in np.nonzero(~known)[0]:
+            placed = [index[v] for v in G.neighbors(nodes[i]) if known[index[v]]]
+            anchor = pos[placed].mean(axis=0) if placed else center
+            pos[i] = anchor + (rng.random(2) - 0.5) * spread * 0.1
+
+    mobility = np.where(known, KNOWN_MOBILITY, 1.0)
+    fresh = known.sum() < 0.5 * n
+    edges = [(index[u], index[v]) for u, v in G.edges()]
+    weights = [G[u][v].get('weight', 1) for u, v in G.edges()]
+    pos = force_layout(n, edges, weights, initial=pos, mobility=None if fresh else mobility,
+                       iterations=iterations if fresh else warm_iterations, seed=seed)
+
+    Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+    save_positions(cache_file, {k: [round(float(x), 6), round(float(y), 6)] for k, (x, y) in zip(keys, pos)})
+    return {node: tuple(pos[i]) for i, node in enumerate(nodes)}
@@ -5,86 +5,275 @@
 Всё в одном: индекс, анализ связей, визуализация графа, семантический анализ.
 """
 
-import os
 import json
-import re
+import hashlib
+import argparse
 from datetime import datetime
 from pathlib import Path
 from collections import Counter, defaultdict
-import networkx as nx
-import matplotlib.pyplot as plt
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine_similarity
-import numpy as np
+from html import escape
+
+# Тяжёлые библиотеки (numpy/scipy, networkx, matplotlib) импортируются внутри стадий,
+# которым они нужны: индексация и справка по CLI запускаются без них
+import lacuna_ahocorasick
+import lacuna_blob
+import lacuna_corpus
+import lacuna_decode
+import lacuna_dedup
+import lacuna_html
+import lacuna_ignore
+import lacuna_jsonl
+import lacuna_keywords
+import lacuna_metrics
+import lacuna_pipeline
+import lacuna_windows
 
 # ========== КОНФИГУРАЦИЯ ==========
 REPO_ROOT = Path("E:/AGI/-_-")
-OUTPUT_DIR = REPO_ROOT / "00_ANALYSIS"
-OUTPUT_DIR.mkdir(exist_ok=True)
+OUTPUT_DIR = REPO_ROOT / "00_ANALYSIS"  # Создаётся при запуске, а не при импорте
+SIMILARITY_THRESHOLD = 0.3   # Порог косинусной близости для пары
+SIMILARITY_TOP_K = None      # Не больше k соседей на файл (None — все выше порога)
+SIMILARITY_BLOCK_SIZE = 1024 # Строк TF-IDF на блок умножения (ограничивает пик памяти)
+FEATURE_CACHE_FILE = OUTPUT_DIR / "00_FEATURE_CACHE.json"  # Частоты терминов по хэшу содержимого
+CONTENT_BLOB_FILE = OUTPUT_DIR / "00_ENHANCED_CONTENT.blob"  # Тексты файлов (+ .offsets), индекс хранит ссылки
+KEYWORD_STOP_WORDS = ['и', 'в', 'на', 'с', 'по', 'о']
+CONTENT_HEAD_CHARS = 5000    # Сколько начальных символов файла хранить (и анализировать без --full-content)
+FULL_CONTENT = False         # True — анализ всего текста окнами (lacuna_windows), память ограничена окном
+CONTENT_STATS_FILE = OUTPUT_DIR / "00_CONTENT_STATS.jsonl"  # Частоты терминов и ссылки по полному тексту
+VECTORIZER = "tfidf"         # "tfidf" — словарь в памяти; "hashed" — потоковый режим для больших архивов
+HASH_FEATURES = 2 ** 18      # Размер хэшированного пространства (режим hashed)
+VECTOR_BATCH_SIZE = 1000     # Документов в памяти одновременно (режим hashed)
+HASHED_VECTORS_DIR = OUTPUT_DIR / "00_HASHED_VECTORS"  # Строки TF-IDF на диске (режим hashed)
+LAYOUT_FILE = OUTPUT_DIR / "00_LAYOUT.json"       # Позиции узлов по пути файла (тёплый старт раскладки)
+LAYOUT_ITERATIONS = 50
+REPORT_DATA_DIR = OUTPUT_DIR / "00_REPORT_DATA"   # Страницы больших таблиц отчёта (подгружаются лениво)
+COMMUNITIES_FILE = OUTPUT_DIR / "00_COMMUNITIES.json"  # Пути файлов по сообществам графа
+GRAPH_LOD = "auto"           # "full" | "collapsed" | "auto" (обзор по сообществам для больших графов)
+LOD_NODE_LIMIT = 300         # В режиме auto больше узлов — рисуем свёрнутый обзор
+LOD_LABELS = 40              # Подписей сообществ в обзоре
+CONNECTIONS_FILE = OUTPUT_DIR / "00_CONNECTIONS.json"      # Результат стадии connect
+KEYWORD_INDEX_FILE = OUTPUT_DIR / "00_KEYWORD_INDEX.json"  # Ключевое слово → файлы с весами (lacuna_keywords)
+VECTOR_SPACE_FILE = OUTPUT_DIR / "00_VECTOR_SPACE.npz"     # Векторы близости для запросов (lacuna_query)
+NEAR_DUP_THRESHOLD = 0.7     # Оценка Жаккара по шинглам, с которой пара считается почти-копией
+NEAR_DUP_SHINGLE = 3         # Слов в шингле
+NEAR_DUP_PERMUTATIONS = 128  # Длина MinHash-подписи
+NEAR_DUPLICATES_FILE = OUTPUT_DIR / "00_NEAR_DUPLICATES.json"  # Результат стадии neardup
+PIPELINE_STATE_FILE = OUTPUT_DIR / "00_PIPELINE_STATE.json"  # Отпечатки входов стадий
+METRICS_FILE = OUTPUT_DIR / "00_METRICS.json"  # Метрики последнего прогона (время, CPU, память, счётчики)
+STAGE_NAMES = ["index", "connect", "neardup", "graph", "report"]
+# Собственные артефакты без префикса 00_ — не индексируются, иначе каждый прогон менял бы входы
+GENERATED_FILES = {"enhanced_index.json", "enhanced_index.jsonl", "graph.gexf", "connection_graph.png"}
 
 # ========== 1. ИНДЕКСАЦИЯ С ДОПОЛНИТЕЛЬНЫМИ ДАННЫМИ ==========
-def create_enhanced_index():
-    """Создаёт расширенный индекс с текстовым содержимым файлов."""
+def iter_source_files():
+    """Файлы репозитория для анализа: без 00_-файлов и собственных артефактов анализатора."""
+    for file_path, stat in lacuna_ignore.walk_files(REPO_ROOT):
+        if file_path.name.startswith("00_"):
+            continue
+        if file_path.parent == OUTPUT_DIR and file_path.name in GENERATED_FILES:
+            continue
+        yield file_path, stat
+
+def source_fingerprint():
+    """Отпечаток входов индексации: пути, размеры и mtime (файлы не читаются)."""
+    h = hashlib.blake2b(digest_size=16)
+    for file_path, stat in iter_source_files():
+        h.update(f"{file_path.relative_to(REPO_ROOT)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode(
+            "utf-8", errors="surrogatepass"))
+    return h.hexdigest()
+
+def previous_encodings():
+    """
+    Кодировки файлов из прошлого расширенного индекса ({путь: кодировка}) —
+    подсказки для lacuna_decode, чтобы не определять кодировку заново.
+    """
+    encodings = {}
+    try:
+        jsonl_path = OUTPUT_DIR / "enhanced_index.jsonl"
+        json_path = OUTPUT_DIR / "enhanced_index.json"
+        if jsonl_path.exists():
+            records = lacuna_jsonl.iter_files(jsonl_path)
+        elif json_path.exists():
+            with open(json_path, 'r', encoding='utf-8') as f:
+                records = json.load(f).get("files", [])
+        else:
+            return encodings
+        for record in records:
+            if record.get("encoding"):
+                encodings[record["path"]] = record["encoding"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return encodings
+
+def iter_content_stats(corpus):
+    """Записи CONTENT_STATS_FILE по порядку id: {"id", "refs": [имена], "terms": {термин: частота}}."""
+    with open(OUTPUT_DIR / corpus.meta["content_stats"], 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def create_enhanced_index(jsonl=False, full_content=False):
+    """
+    Создаёт расширенный индекс с текстовым содержимым файлов.
+    Тексты пишутся в CONTENT_BLOB_FILE, в индексе остаются только ссылки на них.
+    Возвращает компактный корпус (lacuna_corpus.Corpus), с которым работают все стадии.
+    Каждый файл читается один раз (lacuna_decode); кодировка пишется в запись индекса
+    и при следующем прогоне служит подсказкой.
+    Без full_content анализируются первые CONTENT_HEAD_CHARS символов. С full_content
+    файл целиком проходится окнами (lacuna_windows): число слов и строк считается по
+    всему тексту, а частоты терминов и упомянутые имена файлов пишутся построчно в
+    CONTENT_STATS_FILE; в хранилище текстов по-прежнему попадает только начало файла.
+    При jsonl=True записи пишутся потоково в enhanced_index.jsonl по мере чтения
+    файлов (вместо одного большого enhanced_index.json в конце). Корпус с
+    метаданными всех файлов при этом всё равно собирается в памяти — он нужен
+    следующим стадиям; потоковой остаётся только запись индекса.
+    """
     print("[1/4] Создание расширенного индекса...")
+    OUTPUT_DIR.mkdir(exist_ok=True)
     
-    index = {
-        "meta": {
-            "generated_at": datetime.now().isoformat(),
-            "generator": "lacuna_mega_analyzer.py",
-            "repo_path": str(REPO_ROOT)
-        },
-        "files": [],
-        "stats": defaultdict(int)
-    }
+    corpus = lacuna_corpus.Corpus(meta={
+        "generated_at": datetime.now().isoformat(),
+        "generator": "lacuna_mega_analyzer.py",
+        "repo_path": str(REPO_ROOT),
+        "content_blob": CONTENT_BLOB_FILE.name,
+        "content_offsets": lacuna_blob.offsets_path(CONTENT_BLOB_FILE).name,
+        **({"content_stats": CONTENT_STATS_FILE.name} if full_content else {})
+    }, texts=lacuna_blob.ContentStore(CONTENT_BLOB_FILE))
     
-    # Собираем все файлы
-    for file_path in REPO_ROOT.rglob("*"):
-        if file_path.is_file() and not file_path.name.startswith("00_"):
-            try:
-                # Читаем содержимое (первые 5000 символов для анализа)
-                content = ""
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read(5000)
-                except:
-                    with open(file_path, 'r', encoding='cp1251', errors='ignore') as f:
-                        content = f.read(5000)
-                
-                stat = file_path.stat()
-                file_data = {
-                    "id": len(index["files"]),
-                    "name": file_path.name,
-                    "path": str(file_path.relative_to(REPO_ROOT)),
-                    "size": stat.st_size,
-                    "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "extension": file_path.suffix.lower(),
-                    "content_preview": content[:200] + "..." if len(content) > 200 else content,
-                    "content_full": content,
-                    "word_count": len(content.split()),
-                    "lines": content.count('\n') + 1
-                }
-                
-                index["files"].append(file_data)
-                index["stats"]["total_files"] += 1
-                index["stats"]["total_size"] += stat.st_size
-                index["stats"][file_data["extension"]] += 1
-                
-            except Exception as e:
-                print(f"  [!] Ошибка при обработке {file_path}: {e}")
+    hints = previous_encodings()
+    sources = iter_source_files()
+    stats_out = None
+    if full_content:
+        # Имена нужны заранее: ссылки ищутся в том же проходе по окнам
+        sources = list(sources)
+        unique_names = sorted({file_path.name for file_path, _ in sources})
+        matcher = lacuna_ahocorasick.AhoCorasick(unique_names)
+        overlap = max(lacuna_windows.WINDOW_OVERLAP, max(map(len, unique_names), default=0) + 1)
+        stats_out = open(CONTENT_STATS_FILE, 'w', encoding='utf-8')
+        total_chars = 0
+    
+    writer = None
+    if jsonl:
+        index_path = OUTPUT_DIR / "enhanced_index.jsonl"
+        writer = lacuna_jsonl.JsonlIndexWriter(index_path, **corpus.meta)
+    
+    # Собираем все файлы (игнорируемые папки и бинарники отсекаются при обходе)
+    for file_path, stat in sources:
+        try:
+            rel_path = str(file_path.relative_to(REPO_ROOT))
+            counters = {}
+            if stats_out is not None:
+                # Весь текст окнами; в хранилище — только начало
+                stats, encoding = lacuna_windows.analyze_file(
+                    file_path, matcher, hint=hints.get(rel_path),
+                    head_chars=CONTENT_HEAD_CHARS, overlap=overlap)
+                content = stats.head
+                counters = {"word_count": stats.words, "lines": stats.lines}
+                total_chars += stats.chars
+            else:
+                # Читаем содержимое (первые CONTENT_HEAD_CHARS символов для анализа) — байты один раз
+                content, encoding = lacuna_decode.read_text(file_path, limit=CONTENT_HEAD_CHARS,
+                                                            hint=hints.get(rel_path))
+            
+            file_id = corpus.add(
+                name=file_path.name,
+                path=rel_path,
+                size=stat.st_size,
+                mtime=stat.st_mtime,
+                extension=file_path.suffix.lower(),
+                content=content,
+                encoding=encoding,
+                **counters
+            )
+            if stats_out is not None:
+                stats_out.write(json.dumps({"id": file_id,
+                                            "refs": sorted(unique_names[i] for i in stats.refs),
+                                            "terms": stats.terms}, ensure_ascii=False) + "\n")
+            if writer is not None:
+                writer.write(corpus.record_dict(file_id))
+            lacuna_metrics.add_files(1, stat.st_size)
+            
+        except Exception as e:
+            print(f"  [!] Ошибка при обработке {file_path}: {e}")
+    
+    corpus.texts.flush()
+    if stats_out is not None:
+        stats_out.close()
+    
+    # Группы копий: дайджест считается только при совпадении размеров
+    sizes = [{"id": i, "path": corpus.paths[i], "size": corpus.sizes[i]} for i in range(len(corpus))]
+    corpus.duplicates = lacuna_dedup.find_duplicates(sizes, REPO_ROOT, size_key="size")
+    corpus.digests = {entry["id"]: entry["digest"] for entry in sizes if "digest" in entry}
     
     # Сохраняем расширенный индекс
-    index_path = OUTPUT_DIR / "enhanced_index.json"
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    if writer is not None:
+        writer.close(stats=corpus.stats, duplicates=corpus.duplicates)
+    else:
+        index_path = OUTPUT_DIR / "enhanced_index.json"
+        write_enhanced_index(corpus, index_path)
     
     print(f"  [+] Создан расширенный индекс: {index_path}")
-    print(f"  [+] Файлов: {index['stats']['total_files']}")
+    print(f"  [+] Содержимое: {CONTENT_BLOB_FILE} ({corpus.texts.offsets[-1]:,} байт)")
+    if full_content:
+        print(f"  [+] Полный текст: {total_chars:,} символов (окна по {lacuna_windows.WINDOW_CHARS:,}), "
+              f"статистика: {CONTENT_STATS_FILE}")
+    print(f"  [+] Файлов: {corpus.stats['total_files']}")
+    print(f"  [+] Групп дубликатов: {len(corpus.duplicates)}")
     
-    return index
+    return corpus
+
+def write_enhanced_index(corpus, index_path):
+    """
+    Пишет enhanced_index.json в прежнем формате (meta / files / stats / duplicates),
+    собирая словари файлов по одному, без промежуточного списка всех записей.
+    """
+    def dump(value, level):
+        text = json.dumps(value, ensure_ascii=False, indent=2)
+        return text.replace("\n", "\n" + "  " * level)
+    
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "meta": ' + dump(corpus.meta, 1) + ',\n  "files": [')
+        for i, data in enumerate(corpus.iter_record_dicts()):
+            f.write(("," if i else "") + "\n    " + dump(data, 2))
+        f.write(("\n  ]" if len(corpus) else "]") + ',\n  "stats": ' + dump(corpus.stats, 1))
+        f.write(',\n  "duplicates": ' + dump(corpus.duplicates, 1) + "\n}")
+
+def load_enhanced_index(jsonl=False):
+    """
+    Загружает ранее созданный индекс обратно в корпус (для пропущенной стадии index).
+    Тексты не копируются: они читаются из blob-файла через mmap.
+    """
+    if jsonl:
+        index_path = OUTPUT_DIR / "enhanced_index.jsonl"
+        meta = lacuna_jsonl.read_header(index_path)
+        duplicates = (lacuna_jsonl.read_summary(index_path) or {}).get("duplicates", [])
+        records = lacuna_jsonl.iter_files(index_path)
+    else:
+        with open(OUTPUT_DIR / "enhanced_index.json", 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        meta, records, duplicates = data["meta"], data["files"], data.get("duplicates", [])
+    
+    texts = lacuna_blob.ContentBlob(OUTPUT_DIR / meta["content_blob"])
+    return lacuna_corpus.Corpus.from_records(records, texts, meta=meta, duplicates=duplicates)
 
 # ========== 2. АНАЛИЗ СВЯЗЕЙ ==========
-def analyze_connections(index):
-    """Находит явные и скрытые связи между файлами."""
+def analyze_connections(corpus, top_k=SIMILARITY_TOP_K, block_size=SIMILARITY_BLOCK_SIZE,
+                        vectorizer=VECTORIZER, hash_features=HASH_FEATURES,
+                        batch_size=VECTOR_BATCH_SIZE, workers=1, space_file=None):
+    """
+    Находит явные и скрытые связи между файлами.
+    top_k и block_size управляют поиском семантически близких пар (см. lacuna_similarity).
+    vectorizer="hashed" включает потоковую векторизацию (см. analyze_hashed):
+    hash_features, batch_size и workers относятся только к ней.
+    Если индекс построен с полным содержимым (meta["content_stats"]), ссылки и
+    частоты терминов берутся из статистики по окнам, а не из начала текста.
+    space_file — куда сохранить пространство векторов близости для lacuna_query
+    (файл пишется всегда: если векторизовать нечего — пустое пространство).
+    """
+    import numpy as np
+    import lacuna_features
+    import lacuna_query
+    import lacuna_similarity
+    
     print("\n[2/4] Анализ связей между файлами...")
     
     connections = {
@@ -93,95 +282,127 @@ def analyze_connections(index):
         "semantic_similarity": []   # Семантическая близость
     }
     
-    files = index["files"]
+    names = corpus.names
+    full_content = "content_stats" in corpus.meta
+    
+    def scan_texts():
+        """(id, упомянутые имена): один автомат по всем именам, каждый документ — за один проход."""
+        unique_names = sorted(set(names))
+        matcher = lacuna_ahocorasick.AhoCorasick(unique_names)
+        for source_id in range(len(corpus)):
+            content = corpus.text(source_id)
+            if content:
+                # Ищем имена файлов в содержимом (целыми словами, без учёта регистра)
+                yield source_id, [unique_names[name_idx] for name_idx in matcher.find_words(content)]
     
     # 2A. Явные ссылки
     print("  [A] Поиск явных ссылок между файлами...")
-    for i, file1 in enumerate(files):
-        if not file1["content_full"]:
-            continue
-            
-        for file2 in files:
-            if file1["id"] == file2["id"]:
-                continue
-                
-            # Ищем имя файла в содержимом
-            pattern = re.compile(r'\b' + re.escape(file2["name"]) + r'\b', re.IGNORECASE)
-            if pattern.search(file1["content_full"]):
-                connections["explicit_references"].append({
-                    "source": file1["name"],
-                    "target": file2["name"],
-                    "source_id": file1["id"],
-                    "target_id": file2["id"],
-                    "type": "explicit_reference"
-                })
+    if full_content:
+        mentions = ((record["id"], record["refs"]) for record in iter_content_stats(corpus))
+    else:
+        mentions = scan_texts()
+    
+    for source_id, mentioned in mentions:
+        lacuna_metrics.count("name_matches", len(mentioned))
+        target_ids = sorted(
+            target_id
+            for name in mentioned
+            for target_id in corpus.ids_by_name(name)
+            if target_id != source_id
+        )
+        for target_id in target_ids:
+            connections["explicit_references"].append({
+                "source": names[source_id],
+                "target": names[target_id],
+                "source_id": source_id,
+                "target_id": target_id,
+                "type": "explicit_reference"
+            })
+    
+    # Только файлы с текстом
+    valid_file_indices = [file_id for file_id in range(len(corpus)) if corpus.word_counts[file_id] > 10]
+    lacuna_metrics.count("documents", len(valid_file_indices))
+    if space_file is not None:
+        # Пустое пространство на случай, если ниже векторизовать нечего или TF-IDF не построится
+        lacuna_query.save_space(space_file, np.zeros((0, 0)), [], [], corpus, terms=[])
+    if vectorizer == "hashed":
+        analyze_hashed(corpus, valid_file_indices, connections, top_k, block_size,
+                       hash_features, batch_size, workers, full_content, space_file)
+        print(f"  [+] Найдено явных ссылок: {len(connections['explicit_references'])}")
+        print(f"  [+] Файлов с ключевыми словами: {len(connections['keyword_clusters'])}")
+        print(f"  [+] Пар семантически близких файлов: {len(connections['semantic_similarity'])}")
+        for key in connections:
+            lacuna_metrics.count(key, len(connections[key]))
+        return connections
     
     # 2B. Ключевые слова
     print("  [B] Анализ ключевых слов...")
-    all_texts = []
-    valid_file_indices = []
     
-    for file in files:
-        if file["word_count"] > 10:  # Только файлы с текстом
-            all_texts.append(file["content_full"])
-            valid_file_indices.append(file["id"])
+    # Общая векторизация: каждый документ токенизируется один раз (или берётся из кэша),
+    # оба TF-IDF-представления ниже строятся из одних и тех же частот терминов
+    term_counts = []
+    if full_content:
+        # Частоты по всему тексту уже посчитаны при индексации
+        valid = set(valid_file_indices)
+        term_counts = [record["terms"] for record in iter_content_stats(corpus) if record["id"] in valid]
+    elif valid_file_indices:
+        cache = lacuna_features.FeatureCache(FEATURE_CACHE_FILE)
+        term_counts = cache.counts_for(corpus.text(file_id) for file_id in valid_file_indices)
+        cache.save()
+        lacuna_metrics.count("feature_cache_hits", cache.hits)
+        lacuna_metrics.count("feature_cache_misses", cache.misses)
+        print(f"    Кэш признаков: {cache.hits} из кэша, {cache.misses} токенизировано")
     
-    if all_texts:
+    if valid_file_indices:
         # TF-IDF для поиска важных слов
-        vectorizer = TfidfVectorizer(max_features=50, stop_words=['и', 'в', 'на', 'с', 'по', 'о'])
         try:
-            tfidf_matrix = vectorizer.fit_transform(all_texts)
-            feature_names = vectorizer.get_feature_names_out()
+            with lacuna_metrics.timer("tfidf_fit_s"):
+                tfidf_matrix, feature_names = lacuna_features.tfidf(
+                    term_counts, max_features=50, stop_words=KEYWORD_STOP_WORDS)
             
-            # Для каждого файла находим топ-3 ключевых слова
-            for idx, file_id in enumerate(valid_file_indices):
-                feature_index = tfidf_matrix[idx, :].nonzero()[1]
-                tfidf_scores = zip(feature_index, [tfidf_matrix[idx, x] for x in feature_index])
-                sorted_scores = sorted(tfidf_scores, key=lambda x: x[1], reverse=True)
-                
-                top_keywords = []
-                for feature_idx, score in sorted_scores[:3]:
-                    if score > 0.1:  # Порог значимости
-                        top_keywords.append(feature_names[feature_idx])
-                
-                if top_keywords:
-                    file_data = next(f for f in files if f["id"] == file_id)
-                    connections["keyword_clusters"].append({
-                        "file": file_data["name"],
-                        "file_id": file_id,
-                        "keywords": top_keywords
-                    })
-        except:
-            pass
+            # Топ-3 ключевых слова каждого файла — одним проходом по всей матрице
+            rows, features, scores = lacuna_features.top_k_rows(tfidf_matrix, 3, min_score=0.1)  # Порог значимости
+            bounds = np.flatnonzero(np.diff(rows)) + 1
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+                if start == end:
+                    continue  # Ни у одного файла нет весов выше порога
+                file_id = valid_file_indices[rows[start]]
+                connections["keyword_clusters"].append({
+                    "file": names[file_id],
+                    "file_id": file_id,
+                    "keywords": feature_names[features[start:end]].tolist(),
+                    "scores": [round(score, 4) for score in scores[start:end].tolist()]
+                })
+        except ValueError as e:
+            # Пустой словарь: в текстах только стоп-слова
+            print(f"    [!] Ошибка анализа ключевых слов: {e}")
     
     # 2C. Семантическая близость (упрощённая)
     print("  [C] Анализ семантической близости...")
-    if len(all_texts) >= 2:
+    if len(valid_file_indices) >= 2:
         try:
             # Используем TF-IDF для векторизации
-            vectorizer = TfidfVectorizer(max_features=100)
-            tfidf_matrix = vectorizer.fit_transform(all_texts)
+            with lacuna_metrics.timer("tfidf_fit_s"):
+                tfidf_matrix, terms, idf = lacuna_features.tfidf(term_counts, max_features=100, return_idf=True)
+            if space_file is not None:
+                lacuna_query.save_space(space_file, tfidf_matrix, idf, valid_file_indices, corpus, terms=terms)
             
-            # Вычисляем косинусную близость
-            similarity_matrix = sklearn_cosine_similarity(tfidf_matrix)
+            # Косинусная близость блоками по разреженной матрице: храним только пары выше порога
+            with lacuna_metrics.timer("similarity_s"):
+                pairs = lacuna_similarity.similar_pairs(tfidf_matrix, threshold=SIMILARITY_THRESHOLD,
+                                                        top_k=top_k, block_size=block_size)
             
-            # Находим наиболее похожие пары
-            for i in range(len(valid_file_indices)):
-                for j in range(i+1, len(valid_file_indices)):
-                    if similarity_matrix[i][j] > 0.3:  # Порог схожести
-                        file1_id = valid_file_indices[i]
-                        file2_id = valid_file_indices[j]
-                        
-                        file1 = next(f for f in files if f["id"] == file1_id)
-                        file2 = next(f for f in files if f["id"] == file2_id)
-                        
-                        connections["semantic_similarity"].append({
-                            "file1": file1["name"],
-                            "file2": file2["name"],
-                            "file1_id": file1_id,
-                            "file2_id": file2_id,
-                            "similarity": float(similarity_matrix[i][j])
-                        })
+            for i, j, similarity in pairs:
+                file1_id = valid_file_indices[i]
+                file2_id = valid_file_indices[j]
+                
+                connections["semantic_similarity"].append({
+                    "file1": names[file1_id],
+                    "file2": names[file2_id],
+                    "file1_id": file1_id,
+                    "file2_id": file2_id,
+                    "similarity": similarity
+                })
         except Exception as e:
             print(f"    [!] Ошибка семантического анализа: {e}")
     
@@ -189,66 +410,169 @@ def analyze_connections(index):
     print(f"  [+] Файлов с ключевыми словами: {len(connections['keyword_clusters'])}")
     print(f"  [+] Пар семантически близких файлов: {len(connections['semantic_similarity'])}")
     
+    for key in connections:
+        lacuna_metrics.count(key, len(connections[key]))
     return connections
 	
-# ========== 3. ВИЗУАЛИЗАЦИЯ ГРАФА ==========
-def create_visualization(index, connections):
-    """Создаёт визуализацию графа связей."""
-    print("\n[3/4] Создание визуализации графа...")
+def update_keyword_index(corpus, connections):
+    """
+    Обновляет KEYWORD_INDEX_FILE по keyword_clusters: переписываются только файлы,
+    чьи ключевые слова или веса изменились, исчезнувшие файлы удаляются.
+    """
+    index = lacuna_keywords.KeywordIndex.load(KEYWORD_INDEX_FILE)
+    updated, removed = index.sync({
+        corpus.paths[cluster["file_id"]]: list(zip(cluster["keywords"], cluster["scores"]))
+        for cluster in connections["keyword_clusters"]
+    })
+    index.save()
+    print(f"  [+] Индекс ключевых слов: {len(index.keywords)} слов, {len(index)} файлов "
+          f"(обновлено {updated}, удалено {removed}) → {KEYWORD_INDEX_FILE.name}")
+	
+def analyze_hashed(corpus, valid_file_indices, connections, top_k, block_size,
+                   hash_features, batch_size, workers, full_content=False, space_file=None):
+    """
+    Шаги 2B и 2C в потоковом режиме: тексты дважды читаются из blob пачками по
+    batch_size, признаки хэшируются в пространство фиксированного размера (словарь
+    не строится), IDF считается отдельным проходом. Память векторизации задаётся
+    размером пачки; строки матрицы лежат на диске в HASHED_VECTORS_DIR.
+    Отбор 100 (для близости) и 50 (для ключевых слов) самых частых признаков
+    делается по хэшированным столбцам, поэтому при коллизиях результат может
+    немного отличаться от обычного режима. С full_content вместо текстов читаются
+    готовые частоты из CONTENT_STATS_FILE (тоже построчно).
+    """
+    import lacuna_features
+    import lacuna_query
+    import lacuna_similarity
     
-    # Создаём граф
-    G = nx.Graph()
+    print(f"  [B] Потоковая векторизация ({hash_features} признаков, пачки по {batch_size})...")
+    if not valid_file_indices:
+        return
     
-    # Добавляем узлы (файлы)
-    for file in index["files"]:
-        if file["word_count"] > 10:  # Только файлы с контентом
-            G.add_node(
-                file["id"],
-                label=file["name"],
-                size=min(100, max(10, file["size"] / 100)),
-                type=file["extension"]
-            )
+    if full_content:
+        valid = set(valid_file_indices)
+        documents = lambda: (record["terms"] for record in iter_content_stats(corpus) if record["id"] in valid)
+    else:
+        documents = lambda: (corpus.text(file_id) for file_id in valid_file_indices)
+    with lacuna_metrics.timer("tfidf_fit_s"):
+        matrix, doc_keywords, idf = lacuna_features.hashed_tfidf(
+            documents, n_features=hash_features, batch_size=batch_size, workers=workers,
+            directory=HASHED_VECTORS_DIR, max_features=100,
+            keywords=3, keyword_features=50, stop_words=KEYWORD_STOP_WORDS, counts=full_content,
+            return_idf=True)
+    if space_file is not None:
+        lacuna_query.save_space(space_file, matrix, idf, valid_file_indices, corpus, n_features=hash_features)
     
-    # Добавляем рёбра (связи)
-    edge_weights = {}
+    for file_id, top in zip(valid_file_indices, doc_keywords):
+        top = [(term, score) for term, score in top if score > 0.1]  # Порог значимости
+        if top:
+            connections["keyword_clusters"].append({
+                "file": corpus.names[file_id],
+                "file_id": file_id,
+                "keywords": [term for term, _ in top],
+                "scores": [round(score, 4) for _, score in top]
+            })
     
-    # Явные ссылки
-    for conn in connections["explicit_references"]:
-        if conn["source_id"] in G.nodes() and conn["target_id"] in G.nodes():
-            edge_key = (conn["source_id"], conn["target_id"])
-            edge_weights[edge_key] = edge_weights.get(edge_key, 0) + 2
+    print("  [C] Анализ семантической близости...")
+    if len(valid_file_indices) < 2:
+        return
+    with lacuna_metrics.timer("similarity_s"):
+        pairs = lacuna_similarity.similar_pairs(matrix, threshold=SIMILARITY_THRESHOLD,
+                                                top_k=top_k, block_size=block_size)
+    for i, j, similarity in pairs:
+        file1_id = valid_file_indices[i]
+        file2_id = valid_file_indices[j]
+        connections["semantic_similarity"].append({
+            "file1": corpus.names[file1_id],
+            "file2": corpus.names[file2_id],
+            "file1_id": file1_id,
+            "file2_id": file2_id,
+            "similarity": similarity
+        })
+
+def find_near_duplicates(corpus, threshold=NEAR_DUP_THRESHOLD):
+    """
+    Почти-копии (слегка отредактированные варианты) через MinHash-подписи по
+    шинглам из NEAR_DUP_SHINGLE слов и LSH-полосы (lacuna_minhash): кандидаты
+    ищутся почти за линейное время, а не перебором всех пар. Берутся те же файлы,
+    что попадают в граф; при полном содержимом файлы читаются целиком потоково.
+    Возвращает связи типа "near_duplicate" с оценкой коэффициента Жаккара.
+    """
+    import lacuna_minhash
     
-    # Семантическая близость
-    for conn in connections["semantic_similarity"]:
-        if conn["file1_id"] in G.nodes() and conn["file2_id"] in G.nodes():
-            edge_key = (conn["file1_id"], conn["file2_id"])
-            edge_weights[edge_key] = edge_weights.get(edge_key, 0) + conn["similarity"]
+    print("\n[2+/4] Поиск почти-копий (MinHash/LSH)...")
+    hasher = lacuna_minhash.MinHasher(num_perm=NEAR_DUP_PERMUTATIONS)
+    full_content = "content_stats" in corpus.meta
+    signatures = {}
+    for file_id in range(len(corpus)):
+        if corpus.word_counts[file_id] <= 10:
+            continue
+        if full_content:
+            chunks = lacuna_decode.TextStream(REPO_ROOT / corpus.paths[file_id], corpus.encoding(file_id))
+        else:
+            chunks = [corpus.text(file_id)]
+        try:
+            signature = hasher.signature(lacuna_minhash.iter_shingles(
+                lacuna_minhash.iter_tokens(chunks), NEAR_DUP_SHINGLE))
+        except OSError as e:
+            print(f"  [!] Не удалось прочитать {corpus.paths[file_id]}: {e}")
+            continue
+        if signature is not None:
+            signatures[file_id] = signature
+    lacuna_metrics.count("signatures", len(signatures))
     
-    # Добавляем взвешенные рёбра в граф
-    for (node1, node2), weight in edge_weights.items():
-        G.add_edge(node1, node2, weight=weight)
+    with lacuna_metrics.timer("lsh_s"):
+        pairs = lacuna_minhash.near_duplicates(signatures, threshold)
+    near = [{
+        "file1": corpus.names[file1_id],
+        "file2": corpus.names[file2_id],
+        "file1_id": file1_id,
+        "file2_id": file2_id,
+        "jaccard": jaccard,
+        "type": "near_duplicate"
+    } for file1_id, file2_id, jaccard in pairs]
     
-    # Рисуем граф
-    plt.figure(figsize=(15, 12))
+    lacuna_metrics.count("near_duplicates", len(near))
+    print(f"  [+] Подписей: {len(signatures)}, пар почти-копий (Жаккар ≥ {threshold}): {len(near)}")
+    return near
+
+# ========== 3. ВИЗУАЛИЗАЦИЯ ГРАФА ==========
+def node_color(node_type):
+    """Цвет узла по типу файла."""
+    if '.lacuna' in node_type:
+        return '#FF6B6B'  # Красный для лакун
+    elif '.txt' in node_type:
+        return '#4ECDC4'  # Бирюзовый для txt
+    elif '.md' in node_type:
+        return '#45B7D1'  # Синий для md
+    return '#96CEB4'      # Зелёный для остальных
+
+def detect_communities(G):
+    """
+    Сообщества графа связей (Louvain по весам рёбер). Возвращает {узел: номер};
+    номера идут по убыванию размера, одиночные узлы без связей получают -1.
+    """
+    import networkx as nx
     
-    # Раскладка
-    pos = nx.spring_layout(G, k=2, iterations=50)
+    groups = nx.community.louvain_communities(G, weight='weight', seed=42) if G.number_of_edges() else []
+    groups = sorted((sorted(group) for group in groups if len(group) > 1), key=lambda g: (-len(g), g[0]))
+    membership = {node: -1 for node in G.nodes()}
+    for cluster_id, group in enumerate(groups):
+        for node in group:
+            membership[node] = cluster_id
+    return membership
+
+def draw_graph(G, pos, path, title):
+    """Рисует граф (узлы, рёбра, подписи) в PNG."""
+    import networkx as nx
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(15, 12))
     
     # Размер узлов по степени связности
     node_sizes = [G.nodes[node].get('size', 30) * (1 + G.degree(node) * 2) for node in G.nodes()]
     
     # Цвет узлов по типу файла
-    node_colors = []
-    for node in G.nodes():
-        node_type = G.nodes[node].get('type', '')
-        if '.lacuna' in node_type:
-            node_colors.append('#FF6B6B')  # Красный для лакун
-        elif '.txt' in node_type:
-            node_colors.append('#4ECDC4')  # Бирюзовый для txt
-        elif '.md' in node_type:
-            node_colors.append('#45B7D1')  # Синий для md
-        else:
-            node_colors.append('#96CEB4')  # Зелёный для остальных
+    node_colors = [node_color(G.nodes[node].get('type', '')) for node in G.nodes()]
     
     # Рисуем
     nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color=node_colors, alpha=0.9)
@@ -259,20 +583,150 @@ def create_visualization(index, connections):
     
     nx.draw_networkx_edges(G, pos, width=[w * 0.5 for w in weights], alpha=0.5, edge_color='gray')
     
+    # Почти-копии — поверх, красным пунктиром
+    near = [(u, v) for u, v in edges if G[u][v].get('near_duplicate', 0) > 0]
+    if near:
+        nx.draw_networkx_edges(G, pos, edgelist=near, width=2, alpha=0.8,
+                               edge_color='#E63946', style='dashed')
+    
     # Подписи узлов
     labels = {node: G.nodes[node].get('label', '') for node in G.nodes()}
     nx.draw_networkx_labels(G, pos, labels, font_size=8, font_weight='bold')
     
-    plt.title("ГРАФ СВЯЗЕЙ РЕПОЗИТОРИЯ ЛАКУН", fontsize=16, fontweight='bold')
+    plt.title(title, fontsize=16, fontweight='bold')
     plt.axis('off')
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, bbox_inches='tight')
+    plt.close()
+
+def draw_overview(G, pos, membership, path):
+    """
+    Свёрнутый обзор: один узел на сообщество в центре масс его участников,
+    размер — по числу участников, рёбра — суммарный вес связей между сообществами.
+    Одиночные файлы без связей собраны в один серый узел.
+    """
+    import networkx as nx
+    import numpy as np
+    import matplotlib.pyplot as plt
     
-    # Сохраняем изображение
-    graph_path = OUTPUT_DIR / "connection_graph.png"
+    members = defaultdict(list)
+    for node, cluster_id in membership.items():
+        members[cluster_id].append(node)
+    
+    C = nx.Graph()
+    for cluster_id, nodes in members.items():
+        types = Counter(G.nodes[node].get('type', '') for node in nodes)
+        hub = max(nodes, key=G.degree)
+        C.add_node(cluster_id, count=len(nodes),
+                   label=f"#{cluster_id}: {len(nodes)} · {G.nodes[hub].get('label', '')}" if cluster_id >= 0
+                   else f"без связей: {len(nodes)}",
+                   color=node_color(types.most_common(1)[0][0]) if cluster_id >= 0 else '#CCCCCC')
+    for u, v, data in G.edges(data=True):
+        a, b = membership[u], membership[v]
+        if a != b:
+            weight = C[a][b]['weight'] if C.has_edge(a, b) else 0
+            C.add_edge(a, b, weight=weight + data.get('weight', 1))
+    
+    cluster_pos = {cluster_id: tuple(np.mean([pos[node] for node in nodes], axis=0))
+                   for cluster_id, nodes in members.items()}
+    
+    plt.figure(figsize=(15, 12))
+    nx.draw_networkx_nodes(C, cluster_pos, node_size=[200 + 40 * C.nodes[c]['count'] ** 0.75 for c in C.nodes()],
+                           node_color=[C.nodes[c]['color'] for c in C.nodes()], alpha=0.9)
+    nx.draw_networkx_edges(C, cluster_pos, width=[np.log1p(C[u][v]['weight']) for u, v in C.edges()],
+                           alpha=0.4, edge_color='gray')
+    # Подписываем только крупнейшие сообщества, иначе подписи сливаются
+    largest = sorted(C.nodes(), key=lambda c: -C.nodes[c]['count'])[:LOD_LABELS]
+    nx.draw_networkx_labels(C, cluster_pos, {c: C.nodes[c]['label'] for c in largest},
+                            font_size=8, font_weight='bold')
+    plt.title(f"ГРАФ СВЯЗЕЙ РЕПОЗИТОРИЯ ЛАКУН — {len(members)} сообществ", fontsize=16, fontweight='bold')
+    plt.margins(0.15)  # Крупные узлы и подписи не обрезаются по краям
+    plt.axis('off')
     plt.tight_layout()
-    plt.savefig(graph_path, dpi=150, bbox_inches='tight')
+    plt.savefig(path, dpi=150, bbox_inches='tight')
     plt.close()
+
+def create_visualization(corpus, connections, lod=GRAPH_LOD, raster=True):
+    """
+    Создаёт визуализацию графа связей.
+    lod: "full" — каждый файл отдельным узлом, "collapsed" — обзор по сообществам,
+    "auto" — обзор, если узлов больше LOD_NODE_LIMIT. raster=False — без PNG
+    (только GEXF и сообщества), для пакетных запусков без дисплея.
+    Детальные картинки сообществ строятся отдельно: render_cluster_details.
+    """
+    import networkx as nx
+    import lacuna_layout
+    
+    print("\n[3/4] Создание визуализации графа...")
+    
+    # Создаём граф
+    G = nx.Graph()
+    
+    # Добавляем узлы (файлы)
+    for file_id in range(len(corpus)):
+        if corpus.word_counts[file_id] > 10:  # Только файлы с контентом
+            G.add_node(
+                file_id,
+                label=corpus.names[file_id],
+                path=corpus.paths[file_id],
+                size=float(min(100, max(10, corpus.sizes[file_id] / 100))),
+                type=corpus.extension(file_id)
+            )
+    
+    # Добавляем рёбра (связи)
+    edge_weights = {}
+    
+    # Явные ссылки
+    for conn in connections["explicit_references"]:
+        if conn["source_id"] in G.nodes() and conn["target_id"] in G.nodes():
+            edge_key = (conn["source_id"], conn["target_id"])
+            edge_weights[edge_key] = edge_weights.get(edge_key, 0) + 2
+    
+    # Семантическая близость
+    for conn in connections["semantic_similarity"]:
+        if conn["file1_id"] in G.nodes() and conn["file2_id"] in G.nodes():
+            edge_key = (conn["file1_id"], conn["file2_id"])
+            edge_weights[edge_key] = edge_weights.get(edge_key, 0) + conn["similarity"]
+    
+    # Почти-копии (MinHash): сильнее семантической близости
+    near_jaccard = {}
+    for conn in connections.get("near_duplicates", []):
+        if conn["file1_id"] in G.nodes() and conn["file2_id"] in G.nodes():
+            edge_key = (conn["file1_id"], conn["file2_id"])
+            edge_weights[edge_key] = edge_weights.get(edge_key, 0) + 2 * conn["jaccard"]
+            near_jaccard[edge_key] = conn["jaccard"]
+    
+    # Добавляем взвешенные рёбра в граф (near_duplicate — оценка Жаккара, 0 для прочих связей)
+    for (node1, node2), weight in edge_weights.items():
+        jaccard = near_jaccard.get((node1, node2), near_jaccard.get((node2, node1), 0.0))
+        G.add_edge(node1, node2, weight=weight, near_duplicate=float(jaccard))
     
-    print(f"  [+] Граф сохранён: {graph_path}")
+    # Раскладка: приближённая силовая, с тёплым стартом от прошлого прогона
+    pos = lacuna_layout.warm_layout(G, key=lambda node: corpus.paths[node], cache_file=LAYOUT_FILE,
+                                    iterations=LAYOUT_ITERATIONS)
+    
+    # Сообщества: атрибут узла в GEXF и список путей по сообществам для детальных картинок
+    membership = detect_communities(G)
+    nx.set_node_attributes(G, membership, 'community')
+    clusters = defaultdict(list)
+    for node, cluster_id in membership.items():
+        clusters[cluster_id].append(corpus.paths[node])
+    with open(COMMUNITIES_FILE, 'w', encoding='utf-8') as f:
+        json.dump({str(c): paths for c, paths in sorted(clusters.items())}, f, ensure_ascii=False)
+    n_communities = len([c for c in clusters if c >= 0])
+    print(f"  [+] Сообществ: {n_communities} (без связей: {len(clusters.get(-1, []))} файлов)")
+    
+    collapsed = lod == "collapsed" or (lod == "auto" and G.number_of_nodes() > LOD_NODE_LIMIT)
+    graph_path = OUTPUT_DIR / "connection_graph.png"
+    if not raster:
+        graph_path = None
+        print("  [=] Растровый граф пропущен (--no-raster)")
+    elif collapsed:
+        draw_overview(G, pos, membership, graph_path)
+        print(f"  [+] Обзор по сообществам сохранён: {graph_path}")
+    else:
+        draw_graph(G, pos, graph_path, "ГРАФ СВЯЗЕЙ РЕПОЗИТОРИЯ ЛАКУН")
+        print(f"  [+] Граф сохранён: {graph_path}")
     
     # Сохраняем в формате GEXF
     gexf_path = OUTPUT_DIR / "graph.gexf"
@@ -283,11 +737,16 @@ def create_visualization(index, connections):
         print(f"  [!] Не удалось сохранить GEXF: {e}")
         gexf_path = None
     
+    lacuna_metrics.count("graph_nodes", G.number_of_nodes())
+    lacuna_metrics.count("graph_edges", G.number_of_edges())
+    
     # Упрощённая версия без pydot
     result = {
-        "graph_image": str(graph_path.relative_to(REPO_ROOT)),
+        "graph_image": str(graph_path.relative_to(REPO_ROOT)) if graph_path is not None else "",
         "nodes": len(G.nodes()),
-        "edges": len(G.edges())
+        "edges": len(G.edges()),
+        "communities": n_communities,
+        "lod": "collapsed" if collapsed else "full"
     }
     if gexf_path is not None:
         result["gexf_file"] = str(gexf_path.relative_to(REPO_ROOT))
@@ -296,15 +755,59 @@ def create_visualization(index, connections):
     
     return result
 
+def render_cluster_details(cluster_ids):
+    """
+    Детальные картинки выбранных сообществ по запросу — из сохранённых graph.gexf,
+    раскладки и сообществ, без пересчёта графа. Возвращает пути PNG.
+    """
+    import networkx as nx
+    import lacuna_layout
+    
+    G = nx.read_gexf(OUTPUT_DIR / "graph.gexf")
+    positions = lacuna_layout.load_positions(LAYOUT_FILE)
+    paths = []
+    for cluster_id in cluster_ids:
+        nodes = [node for node, data in G.nodes(data=True) if data.get('community') == cluster_id]
+        if not nodes:
+            print(f"  [!] Сообщество #{cluster_id} не найдено")
+            continue
+        sub = G.subgraph(nodes)
+        pos = {node: positions.get(sub.nodes[node].get('path'), (0.0, 0.0)) for node in sub.nodes()}
+        path = OUTPUT_DIR / f"cluster_{cluster_id}.png"
+        draw_graph(sub, pos, path, f"СООБЩЕСТВО #{cluster_id}: {len(nodes)} файлов")
+        print(f"  [+] Сообщество #{cluster_id}: {path}")
+        paths.append(path)
+    return paths
+
 # ========== 4. СОЗДАНИЕ МЕГА-ОТЧЁТА ==========
-def create_mega_report(index, connections, graph_info):
-    """Создаёт комплексный HTML-отчёт с визуализациями."""
+def create_mega_report(corpus, connections, graph_info, index_file="enhanced_index.json"):
+    """
+    Создаёт комплексный HTML-отчёт с визуализациями. Страница пишется потоково
+    (lacuna_html.ReportWriter); таблицы ссылок, ключевых слов и файлов выводятся
+    целиком, но в HTML встроена только первая страница каждой — остальные
+    подгружаются из REPORT_DATA_DIR по кнопке. index_file — имя записанного
+    расширенного индекса (JSON или JSONL) для ссылки на скачивание.
+    """
     print("\n[4/4] Создание мега-отчёта...")
     
     html_path = OUTPUT_DIR / "00_MEGA_REPORT.html"
+    stats = corpus.stats
+    ext_counts = corpus.extension_counts()
+    if not graph_info['graph_image']:
+        graph_figure = "<p><em>Растровый граф не строился (--no-raster) — откройте GEXF в Gephi</em></p>"
+    elif graph_info.get('lod') == "collapsed":
+        graph_figure = (f'<img src="{graph_info["graph_image"]}" alt="Граф связей репозитория">'
+                        f"<p><em>Обзор по сообществам ({graph_info['communities']}): узел — сообщество, "
+                        "размер — число файлов, толщина линий — суммарная сила связей</em></p>")
+    else:
+        graph_figure = (f'<img src="{graph_info["graph_image"]}" alt="Граф связей репозитория">'
+                        "<p><em>Размер узлов показывает важность файла, толщина линий — силу связи</em></p>")
+    lacuna_count = sum(count for ext, count in ext_counts.items() if '.lacuna' in ext)
+    near_duplicates = connections.get("near_duplicates", [])
     
-    # Генерируем HTML
-    html = f"""
+    # Шапка, стили и граф — одним блоком; дальше разделы пишутся в файл по мере генерации
+    report = lacuna_html.ReportWriter(html_path, REPORT_DATA_DIR)
+    report.write(f"""
     <!DOCTYPE html>
     <html lang="ru">
     <head>
@@ -447,6 +950,16 @@ def create_mega_report(index, connections, graph_info):
                 transition: background 0.3s;
             }}
             .download-links a:hover {{ background: #764ba2; }}
+            .pager {{ margin: 10px 0 20px; color: #666; }}
+            .pager button {{
+                margin-left: 15px;
+                padding: 8px 20px;
+                border: none;
+                border-radius: 20px;
+                background: #667eea;
+                color: white;
+                cursor: pointer;
+            }}
         </style>
     </head>
     <body>
@@ -459,7 +972,7 @@ def create_mega_report(index, connections, graph_info):
                 
                 <div class="stats-grid">
                     <div class="stat-card">
-                        <div class="stat-number">{index['stats']['total_files']}</div>
+                        <div class="stat-number">{stats['total_files']}</div>
                         <div class="stat-label">Всего файлов</div>
                     </div>
                     <div class="stat-card">
@@ -471,59 +984,69 @@ def create_mega_report(index, connections, graph_info):
                         <div class="stat-label">Связей</div>
                     </div>
                     <div class="stat-card">
-                        <div class="stat-number">{len([f for f in index['files'] if '.lacuna' in f['extension']])}</div>
+                        <div class="stat-number">{lacuna_count}</div>
                         <div class="stat-label">Файлов-лакун</div>
                     </div>
+                    <div class="stat-card">
+                        <div class="stat-number">{len(near_duplicates)}</div>
+                        <div class="stat-label">Пар почти-копий</div>
+                    </div>
                 </div>
                 
                 <div class="download-links">
                     <a href="{graph_info['graph_image']}" download>📥 Граф (PNG)</a>
                     <a href="{graph_info['gexf_file']}" download>📥 Данные графа (GEXF)</a>
-                    <a href="enhanced_index.json" download>📥 Полный индекс (JSON)</a>
+                    <a href="{index_file}" download>📥 Полный индекс ({Path(index_file).suffix[1:].upper()})</a>
                 </div>
             </header>
             
             <section>
                 <h2>📊 Граф связей между файлами</h2>
                 <div class="graph-container">
-                    <img src="{graph_info['graph_image']}" alt="Граф связей репозитория">
-                    <p><em>Размер узлов показывает важность файла, толщина линий — силу связи</em></p>
+                    {graph_figure}
                 </div>
             </section>
             
+    """)
+    
+    # Явные ссылки — все, постранично
+    references = connections['explicit_references']
+    report.write(f"""
             <section>
                 <h2>🔗 Явные ссылки между файлами</h2>
-                <p>Найдено <strong>{len(connections['explicit_references'])}</strong> прямых ссылок:</p>
-                <div class="connection">
-    """
-    
-    # Добавляем топ-10 явных ссылок
-    for conn in connections['explicit_references'][:10]:
-        html += f"""
-                    <div style="margin: 10px 0; padding: 10px; background: #f8f9fa; border-radius: 5px;">
-                        <strong>📎 {conn['source']}</strong> → <strong>{conn['target']}</strong>
-                    </div>
-        """
-    
-    html += """
-                </div>
+                <p>Найдено <strong>{len(references)}</strong> прямых ссылок:</p>
+    """)
+    report.table("references", ["Откуда", "Куда"], (
+        f"<tr><td>📎 <strong>{escape(conn['source'])}</strong></td>"
+        f"<td><strong>{escape(conn['target'])}</strong></td></tr>"
+        for conn in references))
+    report.write(f"""
+            </section>
+            
+            <section>
+                <h2>🧬 Почти-копии (MinHash/LSH)</h2>
+                <p>Пар слегка отредактированных вариантов: <strong>{len(near_duplicates)}</strong>
+                (оценка коэффициента Жаккара по шинглам из {NEAR_DUP_SHINGLE} слов; на графе — красный пунктир)</p>
+    """)
+    report.table("near", ["Файл", "Вариант", "Жаккар"], (
+        f"<tr><td><strong>{escape(conn['file1'])}</strong></td>"
+        f"<td><strong>{escape(conn['file2'])}</strong></td>"
+        f"<td>{conn['jaccard']:.0%}</td></tr>"
+        for conn in near_duplicates), empty="Почти-копий не найдено")
+    report.write("""
             </section>
             
             <section>
                 <h2>🔑 Ключевые слова по файлам</h2>
-    """
-    
-    # Добавляем ключевые слова
-    for cluster in connections['keyword_clusters'][:15]:
-        html += f"""
-                <div style="margin: 15px 0; padding: 15px; background: #f0f8ff; border-radius: 10px;">
-                    <strong>📄 {cluster['file']}</strong><br>
-        """
-        for keyword in cluster['keywords']:
-            html += f'<span class="keyword">#{keyword}</span> '
-        html += "</div>"
+    """)
     
-    html += """
+    # Ключевые слова — все файлы, постранично
+    report.table("keywords", ["Файл", "Ключевые слова"], (
+        f"<tr><td><strong>📄 {escape(cluster['file'])}</strong></td><td>"
+        + " ".join(f'<span class="keyword">#{escape(keyword)}</span>' for keyword in cluster['keywords'])
+        + "</td></tr>"
+        for cluster in connections['keyword_clusters']))
+    report.write("""
             </section>
             
             <section>
@@ -534,53 +1057,46 @@ def create_mega_report(index, connections, graph_info):
                         <th>Количество</th>
                         <th>Примеры</th>
                     </tr>
-    """
+    """)
     
     # Статистика по расширениям
-    ext_stats = {}
-    for file in index['files']:
-        ext = file['extension'] if file['extension'] else '(без расширения)'
-        ext_stats[ext] = ext_stats.get(ext, 0) + 1
-    
-    for ext, count in sorted(ext_stats.items(), key=lambda x: x[1], reverse=True)[:10]:
-        examples = [f['name'] for f in index['files'] if (f['extension'] if f['extension'] else '(без расширения)') == ext][:3]
-        html += f"""
+    top_exts = sorted(ext_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    
+    # Примеры имён — один проход по кодам расширений, не больше трёх на расширение
+    examples = {ext: [] for ext, _ in top_exts}
+    for file_id, code in enumerate(corpus.ext_codes):
+        names = examples.get(corpus.extensions[code])
+        if names is not None and len(names) < 3:
+            names.append(corpus.names[file_id])
+    
+    for ext, count in top_exts:
+        label = ext if ext else '(без расширения)'
+        report.write(f"""
                     <tr>
-                        <td><code>{ext}</code></td>
+                        <td><code>{escape(label)}</code></td>
                         <td><strong>{count}</strong></td>
-                        <td>{', '.join(examples)}</td>
+                        <td>{escape(', '.join(examples[ext]))}</td>
                     </tr>
-        """
+        """)
     
-    html += """
+    report.write("""
                 </table>
             </section>
             
             <section>
-                <h2>🆕 Последние изменённые файлы</h2>
-                <table>
-                    <tr>
-                        <th>Имя файла</th>
-                        <th>Изменён</th>
-                        <th>Размер</th>
-                        <th>Предпросмотр</th>
-                    </tr>
-    """
+                <h2>🆕 Файлы (сначала последние изменённые)</h2>
+    """)
     
-    # Последние файлы
-    sorted_files = sorted(index['files'], key=lambda x: x['modified'], reverse=True)
-    for file in sorted_files[:10]:
-        html += f"""
-                    <tr>
-                        <td><code>{file['name']}</code></td>
-                        <td>{file['modified'][:19].replace('T', ' ')}</td>
-                        <td>{file['size']:,} б</td>
-                        <td style="font-size: 0.9em; color: #666;">{file['content_preview'][:80]}...</td>
-                    </tr>
-        """
+    # Все файлы по дате изменения, постранично; предпросмотр читается из blob построчно
+    newest = corpus.newest_first()
+    report.table("files", ["Имя файла", "Изменён", "Размер", "Предпросмотр"], (
+        f"<tr><td><code>{escape(corpus.names[file_id])}</code></td>"
+        f"<td>{corpus.modified(file_id)[:19].replace('T', ' ')}</td>"
+        f"<td>{corpus.sizes[file_id]:,} б</td>"
+        f'<td style="font-size: 0.9em; color: #666;">{escape(corpus.preview(file_id)[:80])}...</td></tr>'
+        for file_id in newest))
     
-    html += """
-                </table>
+    report.write(f"""
             </section>
         </div>
         
@@ -590,11 +1106,8 @@ def create_mega_report(index, connections, graph_info):
         </footer>
     </body>
     </html>
-    """
-    
-    # Сохраняем HTML
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    """)
+    report.close()
     
     # Также создаём Markdown-версию для GitHub
     md_path = OUTPUT_DIR / "00_MEGA_REPORT.md"
@@ -602,21 +1115,22 @@ def create_mega_report(index, connections, graph_info):
         f.write(f"""# МЕГА-АНАЛИЗ РЕПОЗИТОРИЯ ЛАКУН
 
 ## 📊 Статистика
-- **Всего файлов:** {index['stats']['total_files']}
-- **Общий размер:** {index['stats']['total_size']:,} байт
+- **Всего файлов:** {stats['total_files']}
+- **Общий размер:** {stats['total_size']:,} байт
 - **Узлов в графе:** {graph_info['nodes']}
 - **Связей в графе:** {graph_info['edges']}
+- **Пар почти-копий:** {len(near_duplicates)}
 
 ## 🔗 Граф связей
-![Граф связей]({graph_info['graph_image']})
+{f"![Граф связей]({graph_info['graph_image']})" if graph_info['graph_image'] else "_Растровый граф не строился (--no-raster)._"}
 
 ## 🆕 Последние файлы
 | Имя файла | Изменён | Размер |
 |-----------|---------|--------|
 """)
         
-        for file in sorted_files[:15]:
-            f.write(f"| `{file['name']}` | {file['modified'][:10]} | {file['size']:,} б |\n")
+        for file_id in newest[:15]:
+            f.write(f"| `{corpus.names[file_id]}` | {corpus.modified(file_id)[:10]} | {corpus.sizes[file_id]:,} б |\n")
     
     print(f"  [+] HTML-отчёт: {html_path}")
     print(f"  [+] Markdown-отчёт: {md_path}")
@@ -627,33 +1141,216 @@ def create_mega_report(index, connections, graph_info):
     }
 
 # ========== ОСНОВНАЯ ФУНКЦИЯ ==========
-def main():
-    """Запускает весь процесс анализа."""
+def build_pipeline(args):
+    """
+    Граф стадий index → connect, neardup → graph → report. Стадия пропускается, если её
+    отпечаток (параметры + отпечатки зависимостей) совпал с прошлым прогоном
+    и артефакты на месте; тогда её результат читается с диска.
+    """
+    index_file = OUTPUT_DIR / ("enhanced_index.jsonl" if args.jsonl else "enhanced_index.json")
+    
+    def run_connect(inputs):
+        connections = analyze_connections(inputs["index"], top_k=args.top_k, block_size=args.block_size,
+                                          vectorizer=args.vectorizer, hash_features=args.hash_features,
+                                          batch_size=args.batch_size, workers=args.vector_workers,
+                                          space_file=VECTOR_SPACE_FILE)
+        with open(CONNECTIONS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(connections, f, ensure_ascii=False)
+        update_keyword_index(inputs["index"], connections)
+        return connections
+    
+    def load_connections():
+        with open(CONNECTIONS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def run_neardup(inputs):
+        near = find_near_duplicates(inputs["index"], threshold=args.near_threshold)
+        with open(NEAR_DUPLICATES_FILE, 'w', encoding='utf-8') as f:
+            json.dump(near, f, ensure_ascii=False)
+        return near
+    
+    def load_near_duplicates():
+        with open(NEAR_DUPLICATES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def all_connections(inputs):
+        """Связи стадии connect вместе с почти-копиями — для графа и отчёта."""
+        return {**inputs["connect"], "near_duplicates": inputs["neardup"]}
+    
+    def connect_params():
+        import lacuna_features
+        return {"threshold": SIMILARITY_THRESHOLD, "top_k": args.top_k,
+                "stop_words": KEYWORD_STOP_WORDS,
+                "tokenizer": lacuna_features.TOKENIZER_VERSION,
+                "vectorizer": args.vectorizer,
+                "hash_features": args.hash_features if args.vectorizer == "hashed" else None}
+    
+    return lacuna_pipeline.Pipeline([
+        lacuna_pipeline.Stage(
+            "index",
+            run=lambda inputs: create_enhanced_index(jsonl=args.jsonl, full_content=args.full_content),
+            params=lambda: {"sources": source_fingerprint(), "jsonl": args.jsonl,
+                            "full_content": args.full_content},
+            outputs=lambda: [index_file, CONTENT_BLOB_FILE, lacuna_blob.offsets_path(CONTENT_BLOB_FILE)]
+                            + ([CONTENT_STATS_FILE] if args.full_content else []),
+            load=lambda: load_enhanced_index(jsonl=args.jsonl)),
+        lacuna_pipeline.Stage(
+            "connect", run=run_connect, deps=["index"],
+            params=connect_params,
+            outputs=lambda: [CONNECTIONS_FILE, KEYWORD_INDEX_FILE, VECTOR_SPACE_FILE],
+            load=load_connections),
+        lacuna_pipeline.Stage(
+            "neardup", run=run_neardup, deps=["index"],
+            params=lambda: {"threshold": args.near_threshold, "shingle": NEAR_DUP_SHINGLE,
+                            "permutations": NEAR_DUP_PERMUTATIONS},
+            outputs=lambda: [NEAR_DUPLICATES_FILE],
+            load=load_near_duplicates),
+        lacuna_pipeline.Stage(
+            "graph", deps=["index", "connect", "neardup"],
+            run=lambda inputs: create_visualization(inputs["index"], all_connections(inputs),
+                                                    lod=args.lod, raster=not args.no_raster),
+            params=lambda: {"lod": args.lod, "raster": not args.no_raster, "limit": LOD_NODE_LIMIT},
+            outputs=lambda: [OUTPUT_DIR / "graph.gexf", COMMUNITIES_FILE]
+                            + ([] if args.no_raster else [OUTPUT_DIR / "connection_graph.png"])),
+        lacuna_pipeline.Stage(
+            "report", deps=["index", "connect", "neardup", "graph"],
+            run=lambda inputs: create_mega_report(inputs["index"], all_connections(inputs), inputs["graph"],
+                                                  index_file=index_file.name),
+            outputs=lambda: [OUTPUT_DIR / "00_MEGA_REPORT.html", OUTPUT_DIR / "00_MEGA_REPORT.md",
+                             REPORT_DATA_DIR]),
+    ], PIPELINE_STATE_FILE)
+
+STAGE_HELP = {
+    "index": "только расширенный индекс (без numpy/networkx/matplotlib)",
+    "connect": "индекс и анализ связей",
+    "neardup": "почти-копии файлов (MinHash/LSH)",
+    "graph": "граф связей (PNG/GEXF, сообщества)",
+    "report": "HTML/Markdown-отчёт (и всё, что для него устарело)",
+}
+
+def add_options(parser, defaults=True):
+    """
+    Опции анализатора. У подкоманд defaults=False: значения по умолчанию не задаются
+    (SUPPRESS), чтобы не затирать опции, указанные перед именем подкоманды.
+    """
+    def default(value):
+        return value if defaults else argparse.SUPPRESS
+    
+    parser.add_argument("--jsonl", action="store_true", default=default(False),
+                        help="писать расширенный индекс потоково в enhanced_index.jsonl; память при этом "
+                             "не плоская: метаданные всех файлов (без текстов) всё равно держатся в памяти "
+                             "для следующих стадий")
+    parser.add_argument("--full-content", action="store_true", default=default(FULL_CONTENT),
+                        help="анализировать файлы целиком (окнами с перекрытием), а не первые "
+                             f"{CONTENT_HEAD_CHARS} символов")
+    parser.add_argument("--top-k", type=int, default=default(SIMILARITY_TOP_K),
+                        help="не больше k семантических соседей на файл")
+    parser.add_argument("--block-size", type=int, default=default(SIMILARITY_BLOCK_SIZE),
+                        help="строк на блок при расчёте близости (ограничивает память)")
+    parser.add_argument("--vectorizer", choices=["tfidf", "hashed"], default=default(VECTORIZER),
+                        help="hashed — потоковая векторизация с ограниченной памятью для больших архивов")
+    parser.add_argument("--hash-features", type=int, default=default(HASH_FEATURES),
+                        help="размер хэшированного пространства признаков (режим hashed)")
+    parser.add_argument("--batch-size", type=int, default=default(VECTOR_BATCH_SIZE),
+                        help="документов в памяти одновременно (режим hashed)")
+    parser.add_argument("--vector-workers", type=int, default=default(1),
+                        help="процессов для токенизации (режим hashed)")
+    parser.add_argument("--near-threshold", type=float, default=default(NEAR_DUP_THRESHOLD),
+                        help="порог оценки Жаккара для почти-копий (стадия neardup)")
+    parser.add_argument("--lod", choices=["auto", "full", "collapsed"], default=default(GRAPH_LOD),
+                        help="детализация графа: каждый файл или обзор по сообществам")
+    parser.add_argument("--no-raster", action="store_true", default=default(False),
+                        help="не рисовать PNG (только GEXF и сообщества) — для пакетных запусков")
+    parser.add_argument("--cluster-detail", default=default(""),
+                        help="номера сообществ через запятую — нарисовать их детальные картинки")
+    parser.add_argument("--force", action="store_true", default=default(False),
+                        help="выполнить выбранные стадии, даже если их входы не изменились")
+    parser.add_argument("--metrics", type=Path, default=default(None),
+                        help=f"куда записать метрики прогона (по умолчанию {METRICS_FILE.name} в папке анализа)")
+    parser.add_argument("--profile", type=Path, default=default(None),
+                        help="записать профиль cProfile выполненных стадий в этот файл")
+    parser.add_argument("--trace-memory", action="store_true", default=default(False),
+                        help="мерить пик выделений Python по стадиям (tracemalloc, замедляет прогон)")
+
+def parse_args(argv=None):
+    """
+    Разбирает аргументы командной строки:
+        lacuna_mega_analyzer.py [опции]                — все стадии
+        lacuna_mega_analyzer.py index|connect|neardup|graph|report [опции]
+    Подкоманда выполняет одну стадию и устаревшие зависимости (актуальные
+    пропускаются); тяжёлые библиотеки импортирует только выполняемая стадия.
+    """
+    parser = argparse.ArgumentParser(description="Мега-анализатор репозитория лакун")
+    add_options(parser)
+    parser.add_argument("--stages", default=",".join(STAGE_NAMES),
+                        help="какие стадии выполнить (через запятую: index,connect,neardup,graph,report); "
+                             "устаревшие зависимости пересчитываются автоматически")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(STAGE_NAMES) + "}")
+    for name in STAGE_NAMES:
+        add_options(commands.add_parser(name, help=STAGE_HELP[name], description=STAGE_HELP[name]),
+                    defaults=False)
+    
+    args = parser.parse_args(argv)
+    if args.command:
+        args.stages = [args.command]
+    else:
+        args.stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in args.stages if name not in STAGE_NAMES]
+    if unknown:
+        parser.error(f"неизвестные стадии: {', '.join(unknown)} (доступны: {', '.join(STAGE_NAMES)})")
+    try:
+        args.cluster_detail = [int(c) for c in args.cluster_detail.split(",") if c.strip()]
+    except ValueError:
+        parser.error("--cluster-detail: ожидаются номера сообществ через запятую")
+    if args.cluster_detail and "graph" not in args.stages:
+        args.stages.append("graph")
+    return args
+
+def main(argv=None):
+    """Запускает выбранные стадии анализа (по умолчанию — все)."""
+    args = parse_args(argv)
     print("=" * 60)
     print("МЕГА-АНАЛИЗАТОР ЛАКУН - ЗАПУСК")
     print("=" * 60)
     
-    # 1. Создаём расширенный индекс
-    index = create_enhanced_index()
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    pipeline = build_pipeline(args)
+    metrics = lacuna_metrics.Metrics("lacuna_mega_analyzer", trace_memory=args.trace_memory, argv=argv)
+    with metrics, lacuna_metrics.profiled(args.profile):
+        results, report = pipeline.run(args.stages, force=set(args.stages) if args.force else ())
+    metrics_file = args.metrics or METRICS_FILE
+    metrics.write(metrics_file)
     
-    # 2. Анализируем связи
-    connections = analyze_connections(index)
+    print("\n[=] Стадии:")
+    measured = {entry["name"]: entry for entry in metrics.stages}
+    for name, status, seconds in report:
+        if status == "skip":
+            print(f"  • {name}: пропущена (входы не изменились)")
+        else:
+            entry = measured[name]
+            memory = f", пик RSS {entry['peak_rss_kb'] / 1024:.0f} МБ" if entry["peak_rss_kb"] else ""
+            print(f"  • {name}: выполнена за {seconds:.2f} с (CPU {entry['cpu_s']:.2f} с{memory})")
+    print(f"[+] Метрики: {metrics_file}")
     
-    # 3. Создаём визуализацию
-    graph_info = create_visualization(index, connections)
+    if args.cluster_detail:
+        print("\n[*] Детальные картинки сообществ...")
+        render_cluster_details(args.cluster_detail)
     
-    # 4. Создаём мега-отчёт
-    report_info = create_mega_report(index, connections, graph_info)
+    if "report" not in results:
+        return
+    corpus, connections, graph_info = results["index"], results["connect"], results["graph"]
+    near_duplicates = results["neardup"]
     
     print("\n" + "=" * 60)
     print("АНАЛИЗ ЗАВЕРШЁН!")
     print("=" * 60)
     print("\n📊 РЕЗУЛЬТАТЫ:")
-    print(f"  • 📁 Файлов проанализировано: {index['stats']['total_files']}")
-    print(f"  • 🔗 Связей обнаружено: {len(connections['explicit_references'])} явных + {len(connections['semantic_similarity'])} семантических")
+    print(f"  • 📁 Файлов проанализировано: {corpus.stats['total_files']}")
+    print(f"  • 🔗 Связей обнаружено: {len(connections['explicit_references'])} явных + {len(connections['semantic_similarity'])} семантических + {len(near_duplicates)} почти-копий")
     print(f"  • 🎨 Граф создан: {graph_info['nodes']} узлов, {graph_info['edges']} связей")
     print(f"  • 📄 HTML-отчёт: {REPO_ROOT}/00_ANALYSIS/00_MEGA_REPORT.html")
-    print(f"  • 📈 Граф (PNG): {REPO_ROOT}/00_ANALYSIS/connection_graph.png")
+    if graph_info['graph_image']:
+        print(f"  • 📈 Граф (PNG): {REPO_ROOT}/00_ANALYSIS/connection_graph.png")
     print(f"  • 💾 Данные графа: {REPO_ROOT}/00_ANALYSIS/graph.gexf (открой в Gephi)")
     
     print("\n🎯 КАК ИСПОЛЬЗОВАТЬ:")
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+МЕТРИКИ ПРОГОНА
+Для каждой стадии инструмента: время по часам и процессорное время, пиковая
+память (RSS процесса; с trace_memory — ещё и пик выделений Python по
+tracemalloc), обработанные файлы и байты, произвольные счётчики (совпадения
+шаблонов, время обучения TF-IDF, итерации раскладки...). Итог пишется одним
+JSON-файлом на прогон; по желанию рядом кладётся дамп cProfile.
+
+    with lacuna_metrics.Metrics("lacuna_indexer") as metrics:
+        with lacuna_metrics.stage("scan"):
+            lacuna_metrics.add_files(1, 4096)
+            lacuna_metrics.count("regex_matches", 3)
+    metrics.write(path)
+
+Модульные функции (stage, begin/end, count, add_files, timer) пишут в активный сборщик
+и ничего не делают, если его нет, — поэтому их можно вызывать из библиотечного
+кода без передачи сборщика через все вызовы.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+METRICS_VERSION = 1
+
+_active = None
+
+def peak_rss_kb():
+    """Пиковый RSS процесса в КБ с его запуска (None, если измерить нечем)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) // 1024
+    except ImportError:
+        return None
+
+class Metrics:
+    """
+    Сборщик метрик одного прогона. Стадии могут вкладываться (имя вложенной —
+    «внешняя/внутренняя»); счётчики идут в самую внутреннюю открытую стадию и
+    в итог прогона. RSS — пик процесса на момент конца стадии (он не убывает),
+    traced_peak_kb — пик памяти Python по tracemalloc за время стадии (вместе с
+    тем, что уже было занято к её началу).
+    """
+
+    def __init__(self, tool, trace_memory=False, argv=None):
+        self.tool = tool
+        self.trace_memory = trace_memory
+        self.argv = list(sys.argv[1:] if argv is None else argv)
+        self.stages = []
+        self.counters = {}
+        self._open = []
+        self._lock = threading.Lock()  # Счётчики могут прийти из потоков-воркеров
+        self._started_at = None
+        self._finished_at = None
+        self._wall = self._cpu = None
+        self._traced_peak = None  # Пик выделений за прогон (байты), если trace_memory
+
+    # ---------- жизненный цикл ----------
+    def start(self):
+        global _active
+        self._started_at = datetime.now().isoformat()
+        self._wall0, self._cpu0 = time.perf_counter(), time.process_time()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._traced_peak = 0
+        _active = self
+        return self
+
+    def stop(self):
+        global _active
+        while self._open:
+            self.end()
+        self._wall = time.perf_counter() - self._wall0
+        self._cpu = time.process_time() - self._cpu0
+        self._finished_at = datetime.now().isoformat()
+        if self._tracing():
+            self._fold_peak()
+            tracemalloc.stop()
+        if _active is self:
+            _active = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    # ---------- стадии ----------
+    def _tracing(self):
+        return self._traced_peak is not None and tracemalloc.is_tracing()
+
+    def _fold_peak(self):
+        """Переносит пик tracemalloc в открытые стадии и итог — перед его сбросом."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for current in self._open:
+            current["peak"] = max(current["peak"], peak)
+        self._traced_peak = max(self._traced_peak, peak)
+
+    def begin(self, name):
+        """Открывает стадию (пара к end(); для блоков удобнее stage())."""
+        if self._open:
+            name = f"{self._open[-1]['name']}/{name}"
+        if self._tracing():
+            self._fold_peak()
+            tracemalloc.reset_peak()
+        self._open.append({"name": name, "wall0": time.perf_counter(), "cpu0": time.process_time(),
+                           "counters": {}, "peak": 0})
+
+    def end(self, status="run"):
+        """Закрывает последнюю открытую стадию и возвращает её запись."""
+        if self._tracing():
+            self._fold_peak()
+        current = self._open.pop()
+        entry = {
+            "name": current["name"],
+            "status": status,
+            "wall_s": round(time.perf_counter() - current["wall0"], 4),
+            "cpu_s": round(time.process_time() - current["cpu0"], 4),
+            "peak_rss_kb": peak_rss_kb(),
+        }
+        if self._traced_peak is not None:
+            entry["traced_peak_kb"] = current["peak"] // 1024
+        entry["counters"] = _rounded(current["counters"])
+        self.stages.append(entry)
+        return entry
+
+    @contextmanager
+    def stage(self, name):
+        self.begin(name)
+        status = "error"
+        try:
+            yield
+            status = "run"
+        finally:
+            self.end(status)
+
+    def skip(self, name):
+        """Отмечает стадию, пропущенную без выполнения (например, актуальную по кэшу)."""
+        self.stages.append({"name": name, "status": "skip"})
+
+    # ---------- счётчики ----------
+    def count(self, name, value=1):
+        with self._lock:
+            targets = [self.counters] + ([self._open[-1]["counters"]] if self._open else [])
+            for counters in targets:
+                counters[name] = counters.get(name, 0) + value
+
+    def add_files(self, files=1, size=0):
+        self.count("files", files)
+        self.count("bytes", size)
+
+    @contextmanager
+    def timer(self, name):
+        """Добавляет длительность блока (секунды) к счётчику name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.count(name, time.perf_counter() - started)
+
+    # ---------- вывод ----------
+    def summary(self):
+        result = {
+            "version": METRICS_VERSION,
+            "tool": self.tool,
+            "argv": self.argv,
+            "started_at": self._started_at,
+            "finished_at": self._finished_at,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pid": os.getpid(),
+            "wall_s": None if self._wall is None else round(self._wall, 4),
+            "cpu_s": None if self._cpu is None else round(self._cpu, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "counters": _rounded(self.counters),
+            "stages": self.stages,
+        }
+        if self._traced_peak is not None:
+            result["traced_peak_kb"] = self._traced_peak // 1024
+        return result
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def print_summary(self):
+        for entry in self.stages:
+            if entry["status"] == "skip":
+                continue
+            memory = f", пик RSS {entry['peak_rss_kb'] / 1024:.0f} МБ" if entry["peak_rss_kb"] else ""
+            if "traced_peak_kb" in entry:
+                memory += f", выделено до {entry['traced_peak_kb'] / 1024:.1f} МБ"
+            print(f"  • {entry['name']}: {entry['wall_s']:.2f} с (CPU {entry['cpu_s']:.2f} с){memory}")
+
+def _rounded(counters):
+    return {name: round(value, 4) if isinstance(value, float) else value
+            for name, value in counters.items()}
+
+# ========== АКТИВНЫЙ СБОРЩИК ==========
+def active():
+    """Текущий сборщик или None."""
+    return _active
+
+def stage(name):
+    return _active.stage(name) if _active is not None else nullcontext()
+
+def begin(name):
+    if _active is not None:
+        _active.begin(name)
+
+def end():
+    if _active is not None:
+        _active.end()
+
+def skip(name):
+    if _active is not None:
+        _active.skip(name)
+
+def count(name, value=1):
+    if _active is not None:
+        _active.count(name, value)
+
+def add_files(files=1, size=0):
+    if _active is not None:
+        _active.add_files(files, size)
+
+def timer(name):
+    return _active.timer(name) if _active is not None else nullcontext()
+
+@contextmanager
+def profiled(path=None):
+    """Профилирует блок cProfile и пишет дамп в path (для pstats/snakeviz); без path — ничего."""
+    if path is None:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(path))
+        print(f"[+] Профиль cProfile: {path}")
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+ПОЧТИ-КОПИИ: MINHASH + LSH
+Документ превращается в множество шинглов (k подряд идущих слов), от него
+строится MinHash-подпись из num_perm минимумов. Доля совпавших позиций двух
+подписей — оценка коэффициента Жаккара их множеств шинглов. Подписи режутся
+на полосы (LSH): пары, совпавшие хотя бы в одной полосе, — кандидаты, и только
+для них считается оценка. Время почти линейно по числу документов.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+import numpy as np
+
+SHINGLE_SIZE = 3         # Слов в шингле
+NUM_PERM = 128           # Длина подписи (число хэш-функций)
+MAX_BUCKET = 200         # Корзина LSH больше этого — связываем только с её первым документом
+BATCH = 4096             # Шинглов за один векторный шаг
+_PRIME = 4294967311      # Простое > 2^32: (a·x + b) < 2^64 для 32-битных a, x, b
+
+# Та же токенизация, что в lacuna_features.TOKEN_RE
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+
+def iter_tokens(chunks):
+    """
+    Слова текста, поданного кусками (lacuna_decode.TextStream или [text]), в нижнем
+    регистре; слово на границе кусков не рвётся — хвост куска ждёт следующий.
+    """
+    tail = ""
+    for chunk in chunks:
+        text = tail + chunk
+        cut = len(text)
+        while cut and (text[cut - 1].isalnum() or text[cut - 1] == "_"):
+            cut -= 1
+        tail = text[cut:]
+        yield from TOKEN_RE.findall(text[:cut].lower())
+    yield from TOKEN_RE.findall(tail.lower())
+
+def iter_shingles(tokens, size=SHINGLE_SIZE):
+    """32-битные хэши шинглов; документ короче size слов — один шингл из всех слов."""
+    window = []
+    emitted = False
+    for token in tokens:
+        window.append(token)
+        if len(window) > size:
+            del window[0]
+        if len(window) == size:
+            emitted = True
+            yield zlib.crc32(" ".join(window).encode("utf-8", errors="surrogatepass"))
+    if not emitted and window:
+        yield zlib.crc32(" ".join(window).encode("utf-8", errors="surrogatepass"))
+
+class MinHasher:
+    """Семейство хэш-функций h_i(x) = (a_i·x + b_i) mod p; подпись — минимумы по шинглам."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles):
+        """Подпись (uint64[num_perm]) по итератору хэшей шинглов или None, если шинглов нет."""
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        empty = True
+        it = iter(shingles)
+        while True:
+            batch = np.fromiter(islice(it, BATCH), dtype=np.uint64)
+            if not len(batch):
+                break
+            empty = False
+            hashed = (np.outer(batch, self.a) + self.b) % np.uint64(_PRIME)
+            np.minimum(signature, hashed.min(axis=0), out=signature)
+        return None if empty else signature
+
+def lsh_params(num_perm, threshold):
+    """(полосы, строк в полосе) с порогом срабатывания (1/b)^(1/r), ближайшим к threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+def near_duplicates(signatures, threshold, max_bucket=MAX_BUCKET):
+    """
+    Пары почти-копий по подписям {id: подпись}: кандидаты из совпавших полос LSH,
+    затем оценка Жаккара (доля равных позиций подписи) не ниже threshold.
+    Возвращает [(id1, id2, оценка)] с id1 < id2, по убыванию оценки.
+    """
+    if not signatures:
+        return []
+    ids = sorted(signatures)
+    matrix = np.vstack([signatures[i] for i in ids])
+    bands, rows = lsh_params(matrix.shape[1], threshold)
+
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        part = np.ascontiguousarray(matrix[:, band * rows:(band + 1) * rows])
+        for pos in range(len(ids)):
+            buckets[part[pos].tobytes()].append(pos)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > max_bucket:
+                # Огромная корзина — обычно точные копии; звезда вместо всех пар
+                candidates.update((members[0], other) for other in members[1:])
+            else:
+                candidates.update((x, y) for k, x in enumerate(members) for y in members[k + 1:])
+
+    pairs = []
+    for x, y in candidates:
+        estimate = float(np.mean(matrix[x] == matrix[y]))
+        if estimate >= threshold:
+            pairs.append((ids[x], ids[y], round(estimate, 4)))
+    pairs.sort(key=lambda p: (-p[2], p[0], p[1]))
+    return pairs
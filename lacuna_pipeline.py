@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+КОНВЕЙЕР СТАДИЙ С КЭШИРОВАНИЕМ
+Стадии образуют граф зависимостей. Отпечаток стадии — хэш её параметров и
+отпечатков зависимостей; он сохраняется в файл состояния вместе со временем
+выполнения. Если отпечаток не изменился и артефакты стадии на месте, стадия
+пропускается, а её результат при необходимости загружается с диска.
+"""
+
+import json
+import time
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import lacuna_metrics
+
+STATE_VERSION = 1
+
+def fingerprint(*parts):
+    """Стабильный хэш JSON-сериализуемых значений."""
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+class Stage:
+    """
+    Одна стадия конвейера.
+        run(inputs)  — выполняет стадию; inputs: {имя зависимости: результат}
+        deps         — имена стадий, результаты которых нужны run
+        params()     — всё, от чего зависит результат, кроме зависимостей
+        outputs()    — пути артефактов, без которых пропуск невозможен
+        load()       — читает результат из артефактов; если не задан, результат
+                       (небольшой, JSON-сериализуемый) хранится прямо в файле состояния
+    """
+
+    def __init__(self, name, run, deps=(), params=None, outputs=None, load=None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.params = params or (lambda: None)
+        self.outputs = outputs or (lambda: [])
+        self.load = load
+
+class Pipeline:
+    """Выполняет выбранные стадии и их зависимости, пропуская актуальные."""
+
+    def __init__(self, stages, state_file):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.state_file = Path(state_file)
+        self.state = {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self.state = data.get("stages", {})
+        except (OSError, ValueError):
+            pass
+
+    def closure(self, targets):
+        """Выбранные стадии вместе со всеми зависимостями, в порядке выполнения."""
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"неизвестная стадия: {name}")
+            needed.add(name)
+            stack.extend(self.stages[name].deps)
+        return [name for name in self.order if name in needed]
+
+    def run(self, targets=None, force=()):
+        """
+        Возвращает (результаты, отчёт). results содержит результаты выполненных
+        стадий и тех пропущенных, что понадобились дальше; report — список
+        (стадия, "run" | "skip", секунды).
+        """
+        fingerprints = {}
+        results = {}
+        report = []
+
+        def result(name):
+            if name not in results:
+                stage = self.stages[name]
+                results[name] = stage.load() if stage.load else self.state[name]["result"]
+            return results[name]
+
+        for name in self.closure(targets or self.order):
+            stage = self.stages[name]
+            fp = fingerprint(name, stage.params(), [fingerprints[dep] for dep in stage.deps])
+            fingerprints[name] = fp
+
+            saved = self.state.get(name, {})
+            fresh = (saved.get("fingerprint") == fp
+                     and (stage.load or "result" in saved)
+                     and all(Path(path).exists() for path in stage.outputs()))
+            if fresh and name not in force:
+                report.append((name, "skip", 0.0))
+                lacuna_metrics.skip(name)
+                continue
+
+            started = time.perf_counter()
+            with lacuna_metrics.stage(name):
+                value = stage.run({dep: result(dep) for dep in stage.deps})
+            seconds = time.perf_counter() - started
+            results[name] = value
+
+            entry = {"fingerprint": fp, "finished_at": datetime.now().isoformat(),
+                     "seconds": round(seconds, 3)}
+            if stage.load is None:
+                entry["result"] = value
+            self.state[name] = entry
+            self.save()
+            report.append((name, "run", seconds))
+        return results, report
+
+    def save(self):
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": STATE_VERSION, "stages": self.state}, f, ensure_ascii=False, indent=2)
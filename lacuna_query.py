@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+ПОИСК ПОХОЖИХ ЛАКУН
+Стадия connect сохраняет пространство векторов семантической близости
+(00_VECTOR_SPACE.npz): словарь или параметры хэширования, веса IDF и
+L2-нормированные строки TF-IDF документов. SimilarityIndex загружает его один
+раз и дальше отвечает на запросы без пересчёта: запрос (свободный текст или
+имя существующего файла) превращается в вектор тем же способом, что и
+документы, а близость — скалярное произведение только по столбцам запроса.
+
+    index = SimilarityIndex.load(path)        # один раз на процесс
+    index.similar_to_text("тело и память", k=10)
+    index.similar_to_file("LACUNA_01.lacuna", k=10)
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+import lacuna_features
+
+SPACE_VERSION = 1
+DEFAULT_SPACE = Path("E:/AGI/-_-") / "00_ANALYSIS" / "00_VECTOR_SPACE.npz"
+
+def save_space(path, matrix, idf, file_ids, corpus, terms=None, n_features=None):
+    """
+    Сохраняет пространство векторов. matrix — нормированные строки TF-IDF документов
+    file_ids (в том же порядке), idf — веса столбцов. Признаки задаются либо
+    словарём terms (режим tfidf), либо размером хэш-пространства n_features (hashed).
+    """
+    meta = {
+        "version": SPACE_VERSION,
+        "mode": "hashed" if terms is None else "tfidf",
+        "n_features": n_features,
+        "tokenizer": lacuna_features.TOKENIZER_VERSION,
+        "terms": None if terms is None else list(terms),
+        "file_ids": list(file_ids),
+        "names": [corpus.names[file_id] for file_id in file_ids],
+        "paths": [corpus.paths[file_id] for file_id in file_ids],
+    }
+    # Столбцы подряд: запрос читает только свои столбцы
+    matrix = sparse.csc_matrix(matrix)
+    with open(path, 'wb') as f:
+        np.savez(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                 shape=np.asarray(matrix.shape), idf=np.asarray(idf, dtype=np.float64),
+                 meta=np.asarray(json.dumps(meta, ensure_ascii=False)))
+
+class SimilarityIndex:
+    """Загруженное пространство векторов; безопасно переиспользовать между запросами."""
+
+    def __init__(self, matrix, idf, meta):
+        self.matrix = matrix  # CSC: документы × признаки
+        self._by_row = None   # CSR-копия для запросов по файлу (строится при первом)
+        self.idf = idf
+        self.meta = meta
+        self.file_ids = meta["file_ids"]
+        self.names = meta["names"]
+        self.paths = meta["paths"]
+        self.vocabulary = {term: col for col, term in enumerate(meta["terms"] or ())}
+        self._rows = {}  # путь или имя -> строка (первое вхождение имени)
+        for row, (name, path) in enumerate(zip(self.names, self.paths)):
+            self._rows.setdefault(path, row)
+            self._rows.setdefault(name, row)
+
+    @classmethod
+    def load(cls, path=DEFAULT_SPACE):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != SPACE_VERSION:
+                raise ValueError(f"{path}: устаревший формат пространства векторов")
+            if meta["tokenizer"] != lacuna_features.TOKENIZER_VERSION:
+                raise ValueError(f"{path}: построено другой токенизацией — перезапустите стадию connect")
+            matrix = sparse.csc_matrix((data["data"], data["indices"], data["indptr"]),
+                                       shape=tuple(data["shape"]))
+            return cls(matrix, data["idf"], meta)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def vector(self, text):
+        """Вектор запроса: (столбцы, L2-нормированные веса) — как у строк документов."""
+        merged = {}
+        for term, count in lacuna_features.tokenize(text).items():
+            if self.meta["mode"] == "hashed":
+                col = lacuna_features.hash_term(term, self.meta["n_features"])
+            else:
+                col = self.vocabulary.get(term)
+                if col is None:
+                    continue
+            merged[col] = merged.get(col, 0) + count
+        cols = np.fromiter(merged, dtype=np.int64, count=len(merged))
+        weights = np.fromiter(merged.values(), dtype=np.float64, count=len(merged)) * self.idf[cols]
+        keep = weights > 0
+        cols, weights = cols[keep], weights[keep]
+        norm = np.sqrt(weights @ weights)
+        return cols, (weights / norm if norm > 0 else weights)
+
+    def _top(self, cols, weights, k, exclude=None):
+        if not len(cols):
+            return []
+        scores = self.matrix[:, cols] @ weights
+        if exclude is not None:
+            scores[exclude] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [{"file": self.names[row], "path": self.paths[row], "file_id": self.file_ids[row],
+                 "similarity": round(float(scores[row]), 4)} for row in candidates.tolist()]
+
+    def similar_to_text(self, text, k=10):
+        """Топ-k лакун, близких к тексту: [{"file", "path", "file_id", "similarity"}]."""
+        cols, weights = self.vector(text)
+        return self._top(cols, weights, k)
+
+    def similar_to_file(self, name, k=10):
+        """
+        Топ-k лакун, близких к файлу из пространства (по пути или имени), без него самого.
+        KeyError — файла нет в пространстве (например, в нём меньше 10 слов).
+        """
+        row = self._rows[name]
+        if self._by_row is None:
+            self._by_row = self.matrix.tocsr()
+        start, end = self._by_row.indptr[row], self._by_row.indptr[row + 1]
+        return self._top(self._by_row.indices[start:end], self._by_row.data[start:end], k, exclude=row)
+
+def print_results(results):
+    for hit in results:
+        print(f"  {hit['similarity']:.3f}  {hit['path']}")
+    print(f"[+] Найдено: {len(results)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск лакун, похожих на текст или файл")
+    parser.add_argument("text", nargs="?",
+                        help="текст запроса (без него и --file — запросы построчно из stdin, "
+                             "строка «file: имя» ищет по файлу)")
+    parser.add_argument("--file", help="имя или путь файла из индекса вместо текста")
+    parser.add_argument("--space", type=Path, default=DEFAULT_SPACE, help="путь к 00_VECTOR_SPACE.npz")
+    parser.add_argument("-k", "--top-k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    args = parser.parse_args(argv)
+
+    if not args.space.exists():
+        print(f"[!] Пространство {args.space} не найдено. Запустите lacuna_mega_analyzer.py connect")
+        return 1
+    started = time.perf_counter()
+    index = SimilarityIndex.load(args.space)
+    if not args.json:
+        print(f"[*] Загружено {len(index)} документов за {time.perf_counter() - started:.3f} с")
+
+    def answer(text=None, name=None):
+        started = time.perf_counter()
+        try:
+            results = index.similar_to_file(name, args.top_k) if name else index.similar_to_text(text, args.top_k)
+        except KeyError:
+            print(f"[!] Файла {name} нет в пространстве векторов")
+            return 1
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False))
+        else:
+            print_results(results)
+            print(f"[=] {1000 * (time.perf_counter() - started):.1f} мс")
+        return 0
+
+    if args.file or args.text:
+        return answer(args.text, args.file)
+    # Долгоживущий режим: пространство загружено один раз, запросы — по строке
+    for line in sys.stdin:
+        line = line.strip()
+        if line.startswith("file:"):
+            answer(name=line[len("file:"):].strip())
+        elif line:
+            answer(line)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
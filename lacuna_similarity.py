@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+РАЗРЕЖЕННЫЙ ПОИСК ПОХОЖИХ ДОКУМЕНТОВ
+Косинусная близость считается блоками строк по разреженной матрице; в памяти
+остаются только пары выше порога и/или top-k соседей каждого документа,
+а не плотная матрица N×N.
+"""
+
+import numpy as np
+from scipy import sparse
+
+def l2_normalize(matrix):
+    """Нормирует строки разреженной матрицы (после этого косинус = скалярное произведение)."""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+def similar_pairs(matrix, threshold=0.3, top_k=None, block_size=1024):
+    """
+    Возвращает список (i, j, близость) с i < j и близостью > threshold.
+    top_k — оставить для каждого документа не больше k ближайших соседей
+    (пара остаётся, если попала в top-k хотя бы одного из двух документов).
+    block_size — сколько строк перемножается за раз; от него зависит пик памяти.
+    Без top_k порядок пар совпадает с обходом верхнего треугольника (по i, затем по j).
+    """
+    X = l2_normalize(matrix).tocsr()
+    XT = X.T.tocsc()
+    n = X.shape[0]
+    if top_k is None:
+        pairs = []
+    else:
+        best = {}
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = (X[start:stop] @ XT).tocsr()
+
+        if top_k is None:
+            coo = block.tocoo()
+            rows = coo.row + start
+            mask = (coo.data > threshold) & (coo.col > rows)
+            rows, cols, vals = rows[mask], coo.col[mask], coo.data[mask]
+            order = np.lexsort((cols, rows))
+            pairs.extend(zip(rows[order].tolist(), cols[order].tolist(), vals[order].tolist()))
+            continue
+
+        for r in range(stop - start):
+            i = start + r
+            lo, hi = block.indptr[r], block.indptr[r + 1]
+            cols, vals = block.indices[lo:hi], block.data[lo:hi]
+            mask = (vals > threshold) & (cols != i)
+            cols, vals = cols[mask], vals[mask]
+            if len(cols) > top_k:
+                keep = np.argpartition(-vals, top_k - 1)[:top_k]
+                cols, vals = cols[keep], vals[keep]
+            for j, value in zip(cols.tolist(), vals.tolist()):
+                best[(min(i, j), max(i, j))] = value
+
+    if top_k is None:
+        return pairs
+    return [(i, j, value) for (i, j), value in sorted(best.items())]
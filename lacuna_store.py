@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLITE-ХРАНИЛИЩЕ ИНДЕКСА ЛАКУН
+Таблица файлов с индексами по расширению, дате и размеру плюс полнотекстовый
+индекс FTS5 по имени, предпросмотру и содержимому. Заполняется индексатором
+(lacuna_indexer.py --sqlite), запрашивается из командной строки:
+
+    python lacuna_store.py --ext .lacuna --since 2026-02-01 --text "вирус"
+"""
+
+import sys
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+
+import lacuna_decode
+
+DEFAULT_DB = Path("E:/AGI/-_-") / "00_LACUNA_INDEX.sqlite"
+MAX_CONTENT_CHARS = 1_000_000  # Сколько текста файла класть в полнотекстовый индекс
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    modified TEXT NOT NULL,
+    preview TEXT,
+    digest TEXT,
+    signature TEXT
+);
+CREATE INDEX IF NOT EXISTS files_extension ON files(extension);
+CREATE INDEX IF NOT EXISTS files_modified ON files(modified);
+CREATE INDEX IF NOT EXISTS files_size ON files(size_bytes);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    name, preview, content, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def has_fts5(conn):
+    """Проверяет, собран ли SQLite с FTS5."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+class LacunaStore:
+    """Обёртка над базой: синхронизация с записями индексатора и запросы."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.fts = has_fts5(self.conn)
+        if self.fts:
+            self.conn.executescript(FTS_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def sync(self, records, manifest, root):
+        """
+        Приводит базу к списку записей. Строки с той же подписью из манифеста
+        не перечитываются; у них обновляется только digest, если он изменился
+        (дайджест появляется у старого файла, когда позже приходит файл того же
+        размера). Изменённые строки обновляются, исчезнувшие удаляются.
+        Возвращает (обновлено, удалено).
+        """
+        root = Path(root)
+        known = {row["path"]: (row["id"], row["signature"], row["digest"])
+                 for row in self.conn.execute("SELECT id, path, signature, digest FROM files")}
+        updated = 0
+        seen = set()
+        with self.conn:
+            for data in records:
+                path = data["path"]
+                seen.add(path)
+                signature = json.dumps(manifest.get(path))
+                row = known.get(path)
+                if row is not None and row[1] == signature:
+                    if row[2] != data.get("digest"):
+                        self.conn.execute("UPDATE files SET digest=? WHERE id=?", (data.get("digest"), row[0]))
+                        updated += 1
+                    continue
+                values = (data["name"], data["extension"], data["size_bytes"], data["modified"],
+                          data["preview"], data.get("digest"), signature)
+                if row is None:
+                    cursor = self.conn.execute(
+                        "INSERT INTO files (name, extension, size_bytes, modified, preview, digest, "
+                        "signature, path) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values + (path,))
+                    file_id = cursor.lastrowid
+                else:
+                    file_id = row[0]
+                    self.conn.execute(
+                        "UPDATE files SET name=?, extension=?, size_bytes=?, modified=?, preview=?, "
+                        "digest=?, signature=? WHERE id=?", values + (file_id,))
+                if self.fts:
+                    self.conn.execute("DELETE FROM files_fts WHERE rowid=?", (file_id,))
+                    self.conn.execute(
+                        "INSERT INTO files_fts (rowid, name, preview, content) VALUES (?, ?, ?, ?)",
+                        (file_id, data["name"], data["preview"], read_content(root / path, data.get("encoding"))))
+                updated += 1
+
+            gone = [(file_id,) for path, (file_id, *_) in known.items() if path not in seen]
+            self.conn.executemany("DELETE FROM files WHERE id=?", gone)
+            if self.fts:
+                self.conn.executemany("DELETE FROM files_fts WHERE rowid=?", gone)
+        return updated, len(gone)
+
+    def query(self, extension=None, since=None, until=None, min_size=None, max_size=None,
+              text=None, raw=False, limit=50):
+        """
+        Фильтрует файлы по расширению, дате изменения (ISO, включительно),
+        размеру и тексту. С текстом результаты упорядочены по релевантности
+        (bm25), иначе — новые сверху. Пустой текст — ValueError; ошибка
+        синтаксиса FTS5 в raw-запросе — sqlite3.OperationalError.
+        """
+        if text is not None and not text.strip():
+            raise ValueError("пустой текстовый запрос")
+        where = []
+        params = []
+        if extension:
+            where.append("f.extension = ?")
+            params.append(extension.lower() if extension.startswith(".") else "." + extension.lower())
+        if since:
+            where.append("f.modified >= ?")
+            params.append(since)
+        if until:
+            # "2026-02-05" должно включать весь день
+            where.append("f.modified < ?")
+            params.append(until + "\uffff")
+        if min_size is not None:
+            where.append("f.size_bytes >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            where.append("f.size_bytes <= ?")
+            params.append(max_size)
+
+        columns = "f.path, f.name, f.extension, f.size_bytes, f.modified, f.preview, f.digest"
+        if text and self.fts:
+            sql = (f"SELECT {columns}, bm25(files_fts) AS score FROM files_fts "
+                   "JOIN files f ON f.id = files_fts.rowid WHERE files_fts MATCH ?")
+            params.insert(0, text if raw else fts_query(text))
+            order = "score"
+        else:
+            sql = f"SELECT {columns} FROM files f WHERE 1=1"
+            if text:
+                # Без FTS5 — медленный, но честный поиск по предпросмотру и имени
+                where.append("(f.preview LIKE ? OR f.name LIKE ?)")
+                params.extend([f"%{text}%"] * 2)
+            order = "f.modified DESC"
+        for clause in where:
+            sql += " AND " + clause
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+def fts_query(text):
+    """Превращает свободный текст в FTS5-запрос: все слова, каждое в кавычках."""
+    terms = [term.replace('"', '""') for term in text.split()]
+    if not terms:
+        raise ValueError("пустой текстовый запрос")
+    return " ".join(f'"{term}"' for term in terms)
+
+def read_content(path, encoding=None):
+    """
+    Текст файла для полнотекстового индекса (битые байты заменяются).
+    encoding — кодировка, уже определённая индексатором (см. lacuna_decode).
+    """
+    try:
+        return lacuna_decode.read_text(path, limit=MAX_CONTENT_CHARS, hint=encoding)[0]
+    except OSError:
+        return ""
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запросы к SQLite-индексу лакун")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="путь к базе")
+    parser.add_argument("--ext", help="расширение, например .lacuna")
+    parser.add_argument("--since", help="изменён не раньше (YYYY-MM-DD[THH:MM])")
+    parser.add_argument("--until", help="изменён не позже (YYYY-MM-DD[THH:MM])")
+    parser.add_argument("--min-size", type=int, help="минимальный размер, байт")
+    parser.add_argument("--max-size", type=int, help="максимальный размер, байт")
+    parser.add_argument("--text", help="полнотекстовый поиск по имени, предпросмотру и содержимому")
+    parser.add_argument("--raw", action="store_true", help="передать --text в FTS5 как есть")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    args = parser.parse_args(argv)
+
+    if not args.db.exists():
+        print(f"[!] База {args.db} не найдена. Запустите lacuna_indexer.py --sqlite")
+        return 1
+
+    with LacunaStore(args.db) as store:
+        try:
+            rows = store.query(extension=args.ext, since=args.since, until=args.until,
+                               min_size=args.min_size, max_size=args.max_size,
+                               text=args.text, raw=args.raw, limit=args.limit)
+        except ValueError as e:
+            parser.error(f"--text: {e}")
+        except sqlite3.OperationalError as e:
+            parser.error(f"--text: некорректный запрос FTS5 ({e}); без --raw слова ищутся как есть")
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for row in rows:
+        print(f"{row['modified'][:16].replace('T', ' ')}  {row['size_bytes']:>9} б  "
+              f"{row['path']}  — {(row['preview'] or '')[:60]}")
+    print(f"[+] Найдено: {len(rows)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+НАБЛЮДАТЕЛЬ ЗА РЕПОЗИТОРИЕМ ЛАКУН
+Отслеживает создание, изменение и удаление файлов: inotify на Linux,
+опрос (polling) везде остальном. События склеиваются в пачки (debounce).
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+from pathlib import Path
+
+import lacuna_ignore
+
+# ========== INOTIFY (Linux) ==========
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct("iIII")
+
+def _load_libc():
+    """libc с inotify или None, если платформа его не поддерживает."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class InotifyWatcher:
+    """
+    Рекурсивный наблюдатель на inotify: по watch-дескриптору на каждую
+    неигнорируемую папку. poll() возвращает множество затронутых путей.
+    """
+
+    def __init__(self, root, rules, libc):
+        import ctypes
+        self._ctypes = ctypes
+        self.root = Path(root)
+        self.rules = rules
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 не удался")
+        self._dirs = {}  # wd -> папка
+        self._add_tree(self.root)
+
+    def _rel(self, path):
+        rel = path.relative_to(self.root).as_posix()
+        return "" if rel == "." else rel
+
+    def _add_tree(self, directory):
+        """Ставит наблюдение на папку и все её неигнорируемые подпапки."""
+        stack = [Path(directory)]
+        while stack:
+            current = stack.pop()
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                err = self._ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    print("[!] Исчерпан лимит inotify (fs.inotify.max_user_watches)")
+                continue
+            self._dirs[wd] = current
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub = Path(entry.path)
+                    if not self.rules.is_path_ignored(self._rel(sub), is_dir=True):
+                        stack.append(sub)
+
+    def poll(self, timeout):
+        """Ждёт события до timeout секунд; возвращает множество путей (Path)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Очередь переполнена — события потеряны, пересматриваем всё дерево
+                changed.add(self.root)
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            path = directory / os.fsdecode(name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if self.rules.is_path_ignored(self._rel(path), is_dir=True):
+                    continue  # Ни наблюдения, ни обхода для игнорируемой папки
+                self._add_tree(path)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+# ========== POLLING (запасной вариант) ==========
+class PollingWatcher:
+    """
+    Запасной наблюдатель: раз в interval секунд обходит дерево (только stat,
+    без чтения содержимого) и сравнивает подписи файлов со снимком.
+    """
+
+    def __init__(self, root, rules, interval=1.0):
+        self.root = Path(root)
+        self.rules = rules
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next = time.monotonic() + interval
+
+    def _scan(self):
+        return {
+            path: (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            for path, stat in lacuna_ignore.walk_files(self.root, self.rules, skip_binary=False)
+        }
+
+    def poll(self, timeout):
+        wait = self._next - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        self._next = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        changed = {path for path, sig in snapshot.items() if self._snapshot.get(path) != sig}
+        changed.update(self._snapshot.keys() - snapshot.keys())
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+# ========== ОБЩИЙ ИНТЕРФЕЙС ==========
+def make_watcher(root, rules, polling=False, interval=1.0):
+    """inotify, если доступен (и не запрошен polling), иначе опрос."""
+    libc = None if polling else _load_libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(root, rules, libc)
+        except OSError as e:
+            print(f"[!] inotify недоступен ({e}), переходим на опрос")
+    return PollingWatcher(root, rules, interval)
+
+def batches(watcher, debounce=0.2, max_delay=1.0):
+    """
+    Бесконечно отдаёт пачки изменённых путей. Пачка закрывается, когда
+    события стихли на debounce секунд, но не позже max_delay от первого события.
+    """
+    while True:
+        pending = watcher.poll(timeout=1.0)
+        if not pending:
+            continue
+        deadline = time.monotonic() + max_delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            more = watcher.poll(timeout=min(debounce, remaining))
+            if not more:
+                break
+            pending |= more
+        yield pending
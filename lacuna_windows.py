@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+ПОТОКОВЫЙ АНАЛИЗ ПОЛНОГО СОДЕРЖИМОГО
+Файл читается кусками (lacuna_decode.TextStream) и обходится окнами
+фиксированного размера с перекрытием. Каждое окно отвечает только за свою
+«основную» часть [0, core): слова, строки и термины, начинающиеся в ней,
+считаются ровно один раз, а перекрытие нужно, чтобы термин или имя файла
+на границе окна были видны целиком. Память на файл — одно окно плюс
+накопленные частоты терминов, независимо от размера файла.
+"""
+
+import re
+from collections import Counter
+
+import lacuna_decode
+
+WINDOW_CHARS = 1 << 16   # Символов в окне
+WINDOW_OVERLAP = 1024    # Перекрытие окон: не меньше самого длинного имени (более длинные термины обрезаются)
+# Та же токенизация, что в lacuna_features.TOKEN_RE (lowercase + token_pattern TfidfVectorizer);
+# продублирована, чтобы индексация не тянула numpy/scipy
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+NONWORD_RE = re.compile(r"(?u)\W")
+
+def iter_windows(chunks, window=WINDOW_CHARS, overlap=WINDOW_OVERLAP):
+    """
+    Окна по потоку кусков текста: (текст окна, core, символ до окна, символ после окна).
+    Следующее окно начинается с позиции core предыдущего; последнее окно — до конца
+    текста (core = его длина). Пустой текст даёт одно пустое окно.
+    """
+    step = window - overlap
+    if step <= 0:
+        raise ValueError("перекрытие должно быть меньше окна")
+    chunks = iter(chunks)
+    buffer = ""
+    before = ""
+    exhausted = False
+    while True:
+        while not exhausted and len(buffer) <= window:
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buffer += chunk
+        if len(buffer) <= window:
+            yield buffer, len(buffer), before, ""
+            return
+        yield buffer[:window], step, before, buffer[window]
+        before = buffer[step - 1]
+        buffer = buffer[step:]
+
+def _is_word(char):
+    return bool(char) and (char.isalnum() or char == "_")
+
+class ContentStats:
+    """
+    Накопитель статистики документа по окнам:
+        words, lines — как len(text.split()) и text.count('\\n') + 1 по всему тексту
+        terms        — частоты терминов (как lacuna_features.tokenize)
+        refs         — индексы шаблонов matcher (lacuna_ahocorasick), найденных целыми словами
+        head         — первые head_chars символов (для предпросмотра и хранилища текстов)
+    """
+
+    def __init__(self, matcher=None, head_chars=0):
+        self.matcher = matcher
+        self.head_chars = head_chars
+        self.head = ""
+        self.chars = 0
+        self.words = 0
+        self.newlines = 0
+        self.terms = Counter()
+        self.refs = set()
+
+    @property
+    def lines(self):
+        return self.newlines + 1
+
+    def feed(self, text, core, before="", after=""):
+        """Учитывает окно text, отвечающее за text[:core] (см. iter_windows)."""
+        core_text = text[:core]
+        if len(self.head) < self.head_chars:
+            self.head += core_text[:self.head_chars - len(self.head)]
+        self.chars += core
+        self.newlines += core_text.count("\n")
+
+        # Слово, начатое в прошлом окне, уже посчитано там
+        self.words += len(core_text.split())
+        if before and not before.isspace() and core_text and not core_text[0].isspace():
+            self.words -= 1
+
+        # Термины, начинающиеся в [0, core): обрезаем по границам слов, чтобы findall
+        # видел их целиком, а продолжение слова из прошлого окна пропускаем
+        start = 0
+        if _is_word(before) and _is_word(text[:1]):
+            match = NONWORD_RE.search(text)
+            start = match.start() if match else len(text)
+        end = core
+        if 0 < core < len(text) and _is_word(text[core - 1]):
+            match = NONWORD_RE.search(text, core)
+            end = match.start() if match else len(text)
+        if start < end:
+            self.terms.update(TOKEN_RE.findall(text[start:end].lower()))
+
+        if self.matcher is not None:
+            self.refs |= self.matcher.find_words(text, before, after)
+
+def analyze_file(path, matcher=None, hint=None, head_chars=0,
+                 window=WINDOW_CHARS, overlap=WINDOW_OVERLAP):
+    """
+    Статистика полного содержимого файла за один потоковый проход.
+    Возвращает (ContentStats, кодировка); OSError пробрасывается.
+    """
+    stream = lacuna_decode.TextStream(path, hint)
+    stats = ContentStats(matcher, head_chars)
+    for text, core, before, after in iter_windows(stream, window, overlap):
+        stats.feed(text, core, before, after)
+    return stats, stream.encoding
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+БЕНЧМАРК ИНСТРУМЕНТОВ ЛАКУН
+Генерирует синтетические репозитории лакун заданных размеров (русский и
+английский текст, utf-8/utf-8-sig/cp1251, немного бинарников и копий) и
+прогоняет на них lacuna_indexer.main, каждую стадию lacuna_mega_analyzer (включая neardup) и
+check_laws.scan_file. Время, пиковый RSS и файлы/сек дописываются в
+00_BENCH_RESULTS.jsonl, чтобы регрессии между версиями были видны.
+Набор startup меряет холодный запуск дешёвых путей (импорт, --help, index)
+и сверяет его с бюджетом STARTUP_BUDGET_S.
+
+    python scripts/bench_lacuna.py --sizes 1000,10000
+    python scripts/bench_lacuna.py --compare
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import importlib
+import contextlib
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lacuna_metrics import peak_rss_kb  # Пиковый RSS — та же реализация, что в метриках инструментов
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = SCRIPTS_DIR.parent
+DEFAULT_WORKDIR = Path(tempfile.gettempdir()) / "lacuna_bench"  # Корпуса (вне репозитория)
+RESULTS_FILE = PROJECT_DIR / "00_BENCH_RESULTS.jsonl"
+
+SUITES = ["indexer", "mega", "laws", "startup"]
+STARTUP_BUDGET_S = 0.5  # Бюджет холодного запуска дешёвых путей (с запуском интерпретатора)
+HEAVY_MODULES = ["numpy", "scipy", "networkx", "matplotlib", "sklearn"]
+# Дешёвые пути: после них в sys.modules не должно быть тяжёлых библиотек
+STARTUP_PROBES = {
+    "startup.import_mega": "import lacuna_mega_analyzer",
+    "startup.import_indexer": "import lacuna_indexer",
+    "startup.mega_help": "import lacuna_mega_analyzer as m\ntry:\n    m.main(['index', '--help'])\nexcept SystemExit:\n    pass",
+}
+FILES_PER_DIR = 200
+
+RU_WORDS = ("лакуна разрыв артефакт тело мозг симбиоз вирус протокол тишина эхо "
+            "петля зеркало память агент перевод незавершённость квант тень свет след").split()
+EN_WORDS = ("lacuna gap artifact body brain symbiosis virus protocol silence echo "
+            "loop mirror memory agent translation incompleteness quantum shadow light trace").split()
+EXTENSIONS = [".lacuna", ".lacuna", ".txt", ".txt", ".md", ".md", ".json", ".py", ""]
+
+# ========== ГЕНЕРАЦИЯ КОРПУСА ==========
+def synth_text(rng, names):
+    """Абзацы из смеси русских и английских слов, иногда со ссылкой на другой файл."""
+    words = RU_WORDS if rng.random() < 0.7 else EN_WORDS
+    lines = []
+    for _ in range(rng.randint(3, 60)):
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(4, 16)))
+        if names and rng.random() < 0.05:
+            line += f" см. {rng.choice(names)}"
+        lines.append(line.capitalize() + ".")
+    return "\n".join(lines) + "\n"
+
+def generate_corpus(root, count, seed=42):
+    """Создаёт синтетический репозиторий из count файлов (повторно не пересоздаёт)."""
+    root = Path(root)
+    marker = root / "00_SYNTH.json"
+    if marker.exists():
+        return root
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    names = []
+    previous = None
+    for i in range(count):
+        directory = root / f"d{i // FILES_PER_DIR:05d}"
+        if i % FILES_PER_DIR == 0:
+            directory.mkdir(exist_ok=True)
+        roll = rng.random()
+        if roll < 0.03:
+            # Бинарники: по расширению и по содержимому
+            path = directory / f"blob_{i}{rng.choice(['.png', '.pack', ''])}"
+            path.write_bytes(bytes(rng.getrandbits(8) for _ in range(rng.randint(256, 4096))) + b"\0")
+            continue
+        name = f"lacuna_{i}{rng.choice(EXTENSIONS)}"
+        path = directory / name
+        if roll < 0.05 and previous is not None:
+            # Точная копия предыдущего файла
+            path.write_bytes(previous)
+        else:
+            text = synth_text(rng, names[-50:])
+            encoding = rng.choices(["utf-8", "utf-8-sig", "cp1251"], weights=[80, 5, 15])[0]
+            previous = text.encode(encoding, errors="replace")
+            path.write_bytes(previous)
+        names.append(name)
+    marker.write_text(json.dumps({"files": count, "seed": seed}), encoding="utf-8")
+    return root
+
+# ========== ИЗМЕРЕНИЯ ==========
+def retarget(module, root, attr="REPO_ROOT"):
+    """Перенаправляет все пути модуля, лежащие под его корнем, в синтетический репозиторий."""
+    old_root = getattr(module, attr)
+    for name, value in list(vars(module).items()):
+        if isinstance(value, Path):
+            try:
+                rel = value.relative_to(old_root)
+            except ValueError:
+                continue
+            setattr(module, name, Path(root) / rel)
+
+def count_files(root):
+    return sum(len(files) for _, _, files in os.walk(root))
+
+def run_suite(suite, root):
+    """Выполняется в дочернем процессе: прогоняет набор и возвращает список замеров."""
+    sys.path[:0] = [str(PROJECT_DIR), str(SCRIPTS_DIR)]
+    root = Path(root)
+    results = []
+
+    def measure(stage, func, files):
+        started = time.perf_counter()
+        value = func()
+        wall = time.perf_counter() - started
+        results.append({
+            "stage": stage,
+            "wall_s": round(wall, 4),
+            "peak_rss_kb": peak_rss_kb(),
+            "files": files,
+            "files_per_s": round(files / wall, 1) if wall > 0 else None,
+        })
+        return value
+
+    total = count_files(root)
+    with contextlib.redirect_stdout(open(os.devnull, "w", encoding="utf-8")):
+        if suite == "indexer":
+            indexer = importlib.import_module("lacuna_indexer")
+            retarget(indexer, root)
+            measure("indexer.full", lambda: indexer.main([]), total)
+            measure("indexer.incremental_nochange", lambda: indexer.main(["--incremental"]), total)
+            measure("indexer.full_jsonl", lambda: indexer.main(["--jsonl"]), total)
+
+        elif suite == "mega":
+            mega = importlib.import_module("lacuna_mega_analyzer")
+            retarget(mega, root)
+            mega.OUTPUT_DIR.mkdir(exist_ok=True)
+            index = measure("mega.index", mega.create_enhanced_index, total)
+            files = len(index)
+            connections = measure("mega.connections", lambda: mega.analyze_connections(index), files)
+            near = measure("mega.neardup", lambda: mega.find_near_duplicates(index), files)
+            # Граф и отчёт получают то же, что в конвейере (all_connections): связи + почти-копии
+            connections = {**connections, "near_duplicates": near}
+            graph_info = measure("mega.visualization",
+                                 lambda: mega.create_visualization(index, connections), files)
+            measure("mega.report",
+                    lambda: mega.create_mega_report(index, connections, graph_info), files)
+
+        elif suite == "startup":
+            for stage, code in STARTUP_PROBES.items():
+                results.append(probe_startup(stage, code))
+            # Индексация без тяжёлых библиотек; время зависит от корпуса, поэтому без бюджета
+            mega_index = ("import contextlib, os, bench_lacuna, lacuna_mega_analyzer as m\n"
+                          f"bench_lacuna.retarget(m, {str(root)!r})\n"
+                          "with contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8')):\n"
+                          "    m.main(['index', '--force'])")
+            results.append(probe_startup("startup.mega_index", mega_index, files=total, budget=None))
+
+        elif suite == "laws":
+            check_laws = importlib.import_module("check_laws")
+            lists_dir = check_laws.LISTS_DIR
+            retarget(check_laws, root, attr="REPO_PATH")
+            check_laws.LISTS_DIR = PROJECT_DIR / lists_dir.name
+            check_laws.load_lists()
+            paths = [Path(d) / name for d, _, names in os.walk(root)
+                     for name in names if not name.startswith("00_")]
+            measure("laws.scan_file", lambda: [check_laws.scan_file(p) for p in paths], len(paths))
+    return results
+
+def probe_startup(stage, code, files=0, budget=STARTUP_BUDGET_S):
+    """
+    Запускает code в новом интерпретаторе и меряет полное время (вместе со стартом
+    Python), а также какие тяжёлые библиотеки оказались импортированы.
+    """
+    script = (f"import sys\nsys.path[:0] = [{str(PROJECT_DIR)!r}, {str(SCRIPTS_DIR)!r}]\n{code}\n"
+              f"import json\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, encoding="utf-8")
+    wall = time.perf_counter() - started
+    row = {"stage": stage, "wall_s": round(wall, 4), "peak_rss_kb": None, "files": files,
+           "files_per_s": round(files / wall, 1) if files and wall > 0 else None}
+    if proc.returncode != 0:
+        row["error"] = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        return row
+    row["heavy_modules"] = json.loads(proc.stdout.strip().splitlines()[-1])
+    if budget is not None:
+        row["budget_s"] = budget
+        row["over_budget"] = wall > budget or bool(row["heavy_modules"])
+    return row
+
+def spawn_suite(suite, root, workdir):
+    """Запускает набор в отдельном процессе, чтобы пиковый RSS не смешивался между наборами."""
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--child", suite, "--root", str(root)]
+    proc = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        tail = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        return [{"stage": suite, "skipped": tail}]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def git_version():
+    """Короткий хэш коммита (и '+dirty' при локальных правках) — метка версии для сравнения."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                             capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+        return (rev or "unknown") + ("+dirty" if dirty else "")
+    except OSError:
+        return "unknown"
+
+# ========== СРАВНЕНИЕ ==========
+def compare(results_file):
+    """Сравнивает два последних прогона (версии) по каждой паре (стадия, размер)."""
+    runs = {}
+    order = []
+    with open(results_file, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if "wall_s" not in row:
+                continue
+            if row["run"] not in runs:
+                order.append(row["run"])
+            runs.setdefault(row["run"], {})[(row["stage"], row["size"])] = row
+    if len(order) < 2:
+        print("[!] Для сравнения нужно минимум два прогона.")
+        return 1
+    old_run, new_run = order[-2], order[-1]
+    old, new = runs[old_run], runs[new_run]
+    print(f"{'стадия':<30} {'файлов':>8} {old[next(iter(old))]['version']:>14} "
+          f"{new[next(iter(new))]['version']:>14} {'Δ':>8}")
+    for key in sorted(new.keys() & old.keys()):
+        before, after = old[key]["wall_s"], new[key]["wall_s"]
+        delta = (after - before) / before * 100 if before else 0.0
+        flag = "  ⚠" if delta > 10 else ""
+        print(f"{key[0]:<30} {key[1]:>8} {before:>13.3f}s {after:>13.3f}s {delta:>+7.1f}%{flag}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк инструментов лакун на синтетических корпусах")
+    parser.add_argument("--sizes", default="1000", help="размеры корпусов через запятую (1000..1000000)")
+    parser.add_argument("--suites", default=",".join(SUITES), help="наборы: " + ",".join(SUITES))
+    parser.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR,
+                        help="где хранить синтетические корпуса")
+    parser.add_argument("--results", type=Path, help="файл результатов (JSON Lines)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", action="store_true", help="сравнить два последних прогона")
+    parser.add_argument("--child", choices=SUITES, help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_suite(args.child, args.root)))
+        return 0
+
+    results_file = args.results or RESULTS_FILE
+    if args.compare:
+        return compare(results_file)
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    run_id = datetime.now().isoformat(timespec="seconds")
+    meta = {"run": run_id, "version": git_version(), "python": platform.python_version(),
+            "platform": platform.platform()}
+    print(f"[*] Бенчмарк {meta['version']} ({run_id})")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        corpus = args.workdir / f"corpus_{size}_{args.seed}"
+        started = time.perf_counter()
+        generate_corpus(corpus, size, args.seed)
+        print(f"[*] Корпус {size} файлов: {corpus} ({time.perf_counter() - started:.1f} с)")
+        for suite in args.suites.split(","):
+            for row in spawn_suite(suite, corpus, args.workdir):
+                row.update(meta, size=size)
+                with open(results_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                if "skipped" in row:
+                    print(f"  [!] {row['stage']}: пропущено — {row['skipped']}")
+                elif row.get("over_budget") or row.get("error"):
+                    print(f"  [!] {row['stage']:<30} {row['wall_s']:>9.3f} с  бюджет {row.get('budget_s')} с, "
+                          f"тяжёлые модули: {row.get('heavy_modules')} {row.get('error', '')}")
+                else:
+                    print(f"  [+] {row['stage']:<30} {row['wall_s']:>9.3f} с  "
+                          f"{row['files_per_s'] or 0:>10.1f} ф/с  RSS {row['peak_rss_kb']} КБ")
+    print(f"[+] Результаты: {results_file}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
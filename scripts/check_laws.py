@@ -2,14 +2,21 @@
 import os
 import json
 import re
+import sys
 import shutil
+import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import lacuna_decode                               # Общее декодирование файлов (из корня репозитория)
+import lacuna_metrics                              # Метрики прогона (время, память, счётчики)
+
 # ========== КОНФИГУРАЦИЯ ПУТЕЙ ==========
 REPO_PATH = Path(r"E:\AGI\-_-")                    # Публичный репозиторий
 PRIVATE_ARCHIVE = Path(r"E:\AGI\private_use")      # Архив для запрещённого
 FACT_CHECK_ARCHIVE = Path(r"E:\AGI\fact_check")    # Архив для серой зоны
 LISTS_DIR = REPO_PATH / "lists"                    # Папка со стоп-листами
+INDEX_FILE = REPO_PATH / "00_LACUNA_INDEX.json"    # Индекс lacuna_indexer.py (кодировки файлов)
 
 # ========== ГЛОБАЛЬНЫЕ СПИСКИ ДАННЫХ ==========
 FORBIDDEN_ORGS = []      # Экстремистские организации
@@ -81,6 +88,7 @@ def has_unlawful_criticism(text):
     has_authority = False
     for trigger in AUTHORITY_TRIGGERS:
         if re.search(rf'\b{trigger}\b', text, re.IGNORECASE):
+            lacuna_metrics.count("regex_matches")
             has_authority = True
             break
     
@@ -110,6 +118,7 @@ def has_unlawful_criticism(text):
     # 4. Проверяем наличие ссылок на официальные источники
     url_pattern = r'https?://[^\s]+(sud|proc|sledcom|roskomnadzor|кодекс|закон)[^\s]*'
     if re.search(url_pattern, text, re.IGNORECASE):
+        lacuna_metrics.count("regex_matches")
         return False  # Риск снят!
     
     # Если дошли сюда: есть критика власти без подтверждения
@@ -130,6 +139,7 @@ def check_risk_combinations(text):
     if religious_terms and violence_terms:
         # Упрощённая проверка: ищем любую пару в одном предложении
         sentences = re.split(r'[.!?]+', text)
+        lacuna_metrics.count("sentences", len(sentences))
         for sentence in sentences:
             has_rel = any(term in sentence.lower() for term in religious_terms)
             has_viol = any(term in sentence.lower() for term in violence_terms)
@@ -140,15 +150,26 @@ def check_risk_combinations(text):
     
     return risk_score, reasons
 
-def scan_file(file_path):
+def load_encodings():
+    """Кодировки файлов из индекса lacuna_indexer.py ({путь: кодировка}), если индекс есть."""
+    try:
+        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+            files = json.load(f).get("files", [])
+        return {REPO_PATH / f["path"]: f["encoding"] for f in files if f.get("encoding")}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def scan_file(file_path, encoding=None):
     """
     Основная функция проверки одного файла.
+    encoding — уже известная кодировка (из индекса); иначе определяется по байтам.
     Возвращает: (статус, баллы_риска, пояснение)
     """
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-    except:
+        content, _ = lacuna_decode.read_text(file_path, hint=encoding)
+        lacuna_metrics.add_files(1, file_path.stat().st_size)
+    except OSError:
+        lacuna_metrics.count("skipped")
         return "SKIP", 0, "Не текстовый файл или ошибка чтения"
     
     # 1. ВЫСШИЙ ПРИОРИТЕТ: Критика власти без подтверждения
@@ -174,13 +195,15 @@ def scan_file(file_path):
     return status, risk_score, reason_text
 
 # ========== ОСНОВНАЯ ЛОГИКА ==========
-def main():
+def scan_repository():
     print("=" * 60)
     print("СКАНЕР СООТВЕТСТВИЯ ЗАКОНАМ РФ v1.0 (РЕЖИМ ОТЛАДКИ)")
     print("=" * 60)
     
     # Загружаем списки
-    if not load_lists():
+    with lacuna_metrics.stage("lists"):
+        loaded = load_lists()
+    if not loaded:
         print("[✗] Не могу продолжить без стоп-листов.")
         return
     
@@ -194,10 +217,12 @@ def main():
     # Статистика
     violations = {"FORBIDDEN": 0, "FACT_CHECK": 0, "TOTAL_FILES": 0}
     files_to_move = []
+    encodings = load_encodings()
     
     # Рекурсивно обходим все файлы в репозитории
     print(f"\n[ДЕБАГ] Начинаю сканирование...")
     
+    lacuna_metrics.begin("scan")
     for root, dirs, files in os.walk(REPO_PATH):
         # Пропускаем служебные папки
         dirs[:] = [d for d in dirs if d not in ['.git', 'scripts', 'lists', '__pycache__']]
@@ -226,12 +251,13 @@ def main():
                 if violations["TOTAL_FILES"] <= 10:  # Покажем первые 10 файлов
                     print(f"  [ПРОВЕРКА #{violations['TOTAL_FILES']}] {file_path.relative_to(REPO_PATH)}")
                 
-                status, risk, reason = scan_file(file_path)
+                status, risk, reason = scan_file(file_path, encodings.get(file_path))
                 
                 if status in ["FORBIDDEN", "FACT_CHECK"]:
                     violations[status] += 1
                     files_to_move.append((file_path, status, reason, risk))
     
+    lacuna_metrics.end()
     print(f"\n[ДЕБАГ] Сканирование завершено.")
     
     # Если не нашли файлов - возможно, неправильный путь
@@ -309,15 +335,19 @@ def main():
     print("=" * 60)
     
     # Загружаем списки
-    if not load_lists():
+    with lacuna_metrics.stage("lists"):
+        loaded = load_lists()
+    if not loaded:
         print("[✗] Не могу продолжить без стоп-листов.")
         return
     
     # Статистика
     violations = {"FORBIDDEN": 0, "FACT_CHECK": 0, "TOTAL_FILES": 0}
     files_to_move = []
+    encodings = load_encodings()
     
     # Рекурсивно обходим все файлы в репозитории
+    lacuna_metrics.begin("scan")
     for root, dirs, files in os.walk(REPO_PATH):
         # Пропускаем служебные папки
         dirs[:] = [d for d in dirs if d not in ['.git', 'scripts', 'lists', '__pycache__']]
@@ -328,12 +358,14 @@ def main():
             # Проверяем только текстовые файлы
             if file_path.suffix.lower() in ['.md', '.txt', '.py', '.js', '.json', '.html', '.css', '.yml', '.yaml']:
                 violations["TOTAL_FILES"] += 1
-                status, risk, reason = scan_file(file_path)
+                status, risk, reason = scan_file(file_path, encodings.get(file_path))
                 
                 if status in ["FORBIDDEN", "FACT_CHECK"]:
                     violations[status] += 1
                     files_to_move.append((file_path, status, reason, risk))
     
+    lacuna_metrics.end()
+    
     # Перемещение файлов
     print(f"\n[!] Нарушений найдено: {violations['FORBIDDEN'] + violations['FACT_CHECK']}")
     
@@ -382,5 +414,23 @@ def main():
         print('    git commit -m "auto: compliance scan"')
         print('    git push origin main')
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Проверка репозитория на соответствие законам РФ")
+    parser.add_argument("--metrics", type=Path,
+                        help="записать метрики прогона (время, CPU, память, файлы, совпадения) в JSON-файл")
+    parser.add_argument("--profile", type=Path, help="записать профиль cProfile в этот файл")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="мерить пик памяти Python по стадиям (tracemalloc, замедляет прогон)")
+    args = parser.parse_args(argv)
+    
+    metrics = lacuna_metrics.Metrics("check_laws", trace_memory=args.trace_memory, argv=argv)
+    with metrics, lacuna_metrics.profiled(args.profile):
+        scan_repository()
+    print("\n[=] Стадии:")
+    metrics.print_summary()
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"[+] Метрики: {args.metrics}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Инкрементальный индексатор: переключение между JSON- и JSONL-индексом."""
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import lacuna_indexer
+import lacuna_jsonl
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """Маленький репозиторий лакун; все пути индексатора указывают в него."""
+    (tmp_path / "Date.txt").write_text("первая строка\n", encoding="utf-8")
+    (tmp_path / "MURUS.lacuna").write_text("стена\n", encoding="utf-8")
+    monkeypatch.setattr(lacuna_indexer, "REPO_ROOT", tmp_path)
+    for name in ("INDEX_FILE", "REPORT_FILE", "MANIFEST_FILE", "JSONL_FILE", "DB_FILE"):
+        monkeypatch.setattr(lacuna_indexer, name, tmp_path / getattr(lacuna_indexer, name).name)
+    return tmp_path
+
+def json_record(path):
+    index = json.loads(lacuna_indexer.INDEX_FILE.read_text(encoding="utf-8"))
+    return next(f for f in index["files"] if f["path"] == path)
+
+def jsonl_record(path):
+    return next(f for f in lacuna_jsonl.iter_files(lacuna_indexer.JSONL_FILE) if f["path"] == path)
+
+def test_switching_formats_does_not_hide_changes(repo):
+    assert lacuna_indexer.main([]) == 0
+    (repo / "Date.txt").write_text("вторая, более длинная строка\n", encoding="utf-8")
+    size = (repo / "Date.txt").stat().st_size
+
+    assert lacuna_indexer.main(["--incremental", "--jsonl"]) == 0
+    assert jsonl_record("Date.txt")["size_bytes"] == size
+
+    # Манифест обновил JSONL-прогон, но JSON-индекс всё ещё старый
+    assert lacuna_indexer.main(["--incremental"]) == 0
+    record = json_record("Date.txt")
+    assert record["size_bytes"] == size
+    assert record["preview"] == "вторая, более длинная строка"
+
+def test_same_format_stays_incremental(repo, capsys):
+    assert lacuna_indexer.main(["--jsonl"]) == 0
+    capsys.readouterr()
+    assert lacuna_indexer.main(["--incremental", "--jsonl"]) == 0
+    assert "изменено 0, удалено 0" in capsys.readouterr().out
+
+def test_jsonl_reuses_duplicate_digests(repo, monkeypatch):
+    (repo / "copy_a.txt").write_text("одно и то же\n", encoding="utf-8")
+    (repo / "copy_b.txt").write_text("одно и то же\n", encoding="utf-8")
+    hashed = []
+    file_digest = lacuna_indexer.lacuna_dedup.file_digest
+    monkeypatch.setattr(lacuna_indexer.lacuna_dedup, "file_digest",
+                        lambda path: hashed.append(path.name) or file_digest(path))
+
+    assert lacuna_indexer.main(["--jsonl"]) == 0
+    assert sorted(hashed) == ["copy_a.txt", "copy_b.txt"]
+
+    hashed.clear()
+    (repo / "Date.txt").write_text("другая строка\n", encoding="utf-8")
+    assert lacuna_indexer.main(["--incremental", "--jsonl"]) == 0
+    assert hashed == []
+    assert jsonl_record("copy_a.txt")["digest"] == jsonl_record("copy_b.txt")["digest"]
+    summary = lacuna_jsonl.read_summary(lacuna_indexer.JSONL_FILE)
+    assert [group["paths"] for group in summary["duplicates"]] == [["copy_a.txt", "copy_b.txt"]]